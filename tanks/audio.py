@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from functools import cache
+from random import choice
+
+import pygame as pg
+
+import tanks.store as store
+
+
+@dataclass(frozen=True, slots=True)
+class SoundCategory:
+    # Asset path prefix of all sounds in this category
+    prefix: str
+    # Number of mixer channels reserved for this category
+    channels: int
+    # Minimum time in ms between two plays of the same sound
+    min_interval: int
+
+
+SOUND_CATEGORIES = {
+    "shot": SoundCategory("/sounds/shot/", 4, 60),
+    "explosion": SoundCategory("/sounds/explosion-in-battle", 2, 150),
+}
+
+
+class Audio:
+    """
+    Plays sounds on channel groups reserved per category.
+
+    If all channels of a category are busy, the voice that started first is stolen.
+    The same sound is not played again within the category's `min_interval`, so the
+    cost per frame stays constant whatever the fire rate is.
+    """
+
+    def __init__(self, categories: dict[str, SoundCategory] = SOUND_CATEGORIES):
+        self.categories = categories
+
+        reserved = sum(category.channels for category in categories.values())
+        if pg.mixer.get_num_channels() < reserved * 2:
+            pg.mixer.set_num_channels(reserved * 2)
+        pg.mixer.set_reserved(reserved)
+
+        self.sounds: dict[str, list[pg.mixer.Sound]] = {}
+        self.channels: dict[str, list[pg.mixer.Channel]] = {}
+        self.started: dict[str, list[int]] = {}
+        self.last_played: dict[pg.mixer.Sound, int] = {}
+
+        index = 0
+        for name, category in categories.items():
+            self.sounds[name] = [
+                asset
+                for path, asset in store.ASSETS.items()
+                if path.startswith(category.prefix) and path.endswith(".wav")
+            ]
+            self.channels[name] = [pg.mixer.Channel(i) for i in range(index, index + category.channels)]
+            self.started[name] = [0] * category.channels
+            index += category.channels
+
+    def play(self, category: str):
+        sounds = self.sounds[category]
+        if not sounds:
+            return
+
+        sound = choice(sounds)
+        now = pg.time.get_ticks()
+        min_interval = self.categories[category].min_interval
+        if now - self.last_played.get(sound, -min_interval) < min_interval:
+            return
+        self.last_played[sound] = now
+
+        channels = self.channels[category]
+        started = self.started[category]
+
+        # Prefer a free channel, otherwise steal the oldest voice
+        index = next((i for i, channel in enumerate(channels) if not channel.get_busy()), None)
+        if index is None:
+            index = started.index(min(started))
+            channels[index].stop()
+
+        channels[index].play(sound)
+        started[index] = now
+
+
+class NullAudio:
+    """Audio backend that does nothing, used when muted or without a sound device."""
+
+    def play(self, category: str):
+        pass
+
+
+@cache
+def get_audio() -> Audio | NullAudio:
+    if store.MUTE or not pg.mixer.get_init():
+        return NullAudio()
+
+    return Audio()
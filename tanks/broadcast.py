@@ -0,0 +1,237 @@
+import asyncio
+import atexit
+import json
+import socket
+import struct
+import threading
+from functools import cache
+
+import tanks.store as store
+
+# Kinds of messages. Every message is prefixed with its length.
+HELLO = 0
+KEYFRAME = 1
+DELTA = 2
+# A keyframe every second, so viewers that skipped frames or just joined catch up quickly
+KEYFRAME_INTERVAL = 60
+
+LENGTH = struct.Struct("<I")
+# Kind, tick, end animation frame and the number of tanks, shells and broken tiles
+HEADER = struct.Struct("<BIHBHH")
+# Id, x, y, body angle, turret angle, health, ammo and whether the tank is destroyed.
+# Positions are in pixels, so they need 32 bits on maps wider than 1023 tiles.
+TANK = struct.Struct("<BiihhhBB")
+# x, y and angle
+SHELL = struct.Struct("<iih")
+# x and y of a tile whose wall broke
+TILE = struct.Struct("<HH")
+
+
+def _message(kind: int, body: bytes) -> bytes:
+    return LENGTH.pack(len(body) + 1) + bytes((kind,)) + body
+
+
+class FrameEncoder:
+    """
+    Serialises the state of one match into frames.
+
+    A keyframe has the full state. A delta frame only has the tanks that changed and the
+    tiles that broke since the frame before, so it only applies on top of that frame.
+    Shells move every tick, so every frame has all of them.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.hello = _message(
+            HELLO,
+            json.dumps({
+                "map": game.map_type,
+                # The viewer bakes the map with the same seed, so it looks the same
+                "seed": game.map_handler.seed,
+                "tanks": [(tank.type_path, tank.color) for tank in game.tanks],
+            }).encode(),
+        )
+        self.frames = 0
+        # The last record sent for every tank
+        self.tanks: dict[int, bytes] = {}
+        self.map_version = game.map_handler.version
+        self.tile_map = [row.copy() for row in game.map_handler.tile_map]
+        self.broken: list[tuple[int, int]] = []
+
+    def find_broken_tiles(self) -> list[tuple[int, int]]:
+        tile_map = self.game.map_handler.tile_map
+        broken = [
+            (x, y)
+            for y, row in enumerate(tile_map)
+            for x, tile in enumerate(row)
+            if tile != self.tile_map[y][x]
+        ]
+        self.tile_map = [row.copy() for row in tile_map]
+        return broken
+
+    def encode(self) -> tuple[bytes, bool]:
+        """The frame of the current tick and whether it is a keyframe."""
+
+        game = self.game
+        keyframe = self.frames % KEYFRAME_INTERVAL == 0
+        self.frames += 1
+
+        # Only look for broken walls when the map changed
+        tiles = []
+        if game.map_handler.version != self.map_version:
+            self.map_version = game.map_handler.version
+            tiles = self.find_broken_tiles()
+            self.broken.extend(tiles)
+        if keyframe:
+            tiles = self.broken
+
+        tanks = []
+        for tank in game.tanks:
+            record = TANK.pack(
+                tank.id,
+                tank.box.x,
+                tank.box.y,
+                tank.draw_angle,
+                round(tank.turret_angle) % 360,
+                tank.health,
+                tank.current_ammo,
+                tank.is_destroyed,
+            )
+            if keyframe or self.tanks.get(tank.id) != record:
+                self.tanks[tank.id] = record
+                tanks.append(record)
+
+        shells = [
+            SHELL.pack(shell.box.x, shell.box.y, round(shell.angle) % 360)
+            for shell in game.get_bullets()
+        ]
+
+        header = HEADER.pack(
+            KEYFRAME if keyframe else DELTA,
+            game.frame,
+            min(game.end_animation_frame, 0xFFFF),
+            len(tanks),
+            len(shells),
+            len(tiles),
+        )
+        body = b"".join((header, *tanks, *shells, *(TILE.pack(*tile) for tile in tiles)))
+        return LENGTH.pack(len(body)) + body, keyframe
+
+
+class Viewer:
+    """A connected viewer. It only gets delta frames while it has seen every frame."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.synced = False
+        self.skipped = 0
+
+
+class SpectatorServer:
+    """
+    Broadcasts the running match to read-only viewers over TCP.
+
+    Each tick the game thread encodes the frame once and hands the bytes to an asyncio
+    loop on a background thread, which writes the same bytes to every viewer. So the cost
+    for the game stays the same no matter how many viewers there are. A viewer with more
+    than `max_buffer` bytes waiting is skipped instead of slowing everyone down, and
+    gets frames again from the next keyframe on.
+    """
+
+    def __init__(self, host: str, port: int, max_buffer: int = 16 * 1024):
+        self.max_buffer = max_buffer
+        self.viewers: dict[asyncio.StreamWriter, Viewer] = {}
+        self.encoder: FrameEncoder | None = None
+        # The hello of the current match, sent to every viewer that connects
+        self.hello: bytes | None = None
+
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._connect, host, port)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def publish(self, game):
+        """Encode the current tick of a game and send it to all viewers."""
+
+        if self.encoder is None or self.encoder.game is not game:
+            self.encoder = FrameEncoder(game)
+            self.loop.call_soon_threadsafe(self._start_match, self.encoder.hello)
+
+        frame, keyframe = self.encoder.encode()
+        self.loop.call_soon_threadsafe(self._broadcast, frame, keyframe)
+
+    def close(self):
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+    async def _shutdown(self):
+        # Disconnecting the viewers ends their handlers, which the server waits for
+        self.server.close()
+        for writer in list(self.viewers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # The kernel buffer counts towards the lag of a slow viewer as well
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.max_buffer)
+
+        if self.hello:
+            writer.write(self.hello)
+        self.viewers[writer] = Viewer(writer)
+
+        # Viewers don't send anything, so this only returns when they disconnect
+        try:
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            del self.viewers[writer]
+            writer.close()
+
+    def _start_match(self, hello: bytes):
+        self.hello = hello
+        for viewer in self.viewers.values():
+            viewer.writer.write(hello)
+            viewer.synced = False
+
+    def _broadcast(self, frame: bytes, keyframe: bool):
+        for viewer in self.viewers.values():
+            # Disconnected, but the reader hasn't noticed yet
+            if viewer.writer.is_closing():
+                continue
+
+            if viewer.writer.transport.get_write_buffer_size() > self.max_buffer:
+                viewer.synced = False
+                viewer.skipped += 1
+                continue
+
+            if not viewer.synced:
+                if not keyframe:
+                    continue
+                viewer.synced = True
+            viewer.writer.write(frame)
+
+
+class NullSpectatorServer:
+    """A server without viewers, used when spectating is turned off."""
+
+    def publish(self, game):
+        pass
+
+
+@cache
+def get_spectator_server() -> SpectatorServer | NullSpectatorServer:
+    if not store.SPECTATE:
+        return NullSpectatorServer()
+
+    return SpectatorServer(store.SPECTATOR_HOST, store.SPECTATOR_PORT, store.SPECTATOR_BUFFER)
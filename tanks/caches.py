@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from functools import wraps
+
+# All caches created with `tracked_cache`, by qualified function name. Kept out of
+# tanks.memory, which loads pygame and the assets, so the map compiler doesn't need them.
+CACHES: dict[str, Callable] = {}
+
+
+def tracked_cache(func: Callable) -> Callable:
+    """Like `functools.cache`, but the entries can be inspected for memory accounting."""
+
+    entries = {}
+
+    @wraps(func)
+    def wrapper(*args):
+        value = entries.get(args, entries)
+        if value is entries:
+            value = entries[args] = func(*args)
+        return value
+
+    wrapper.entries = entries
+    wrapper.cache_clear = entries.clear
+    CACHES[f"{func.__module__}.{func.__qualname__}"] = wrapper
+    return wrapper
+
+
+def bounded_cache(maxsize: int) -> Callable[[Callable], Callable]:
+    """Like `tracked_cache`, but only the `maxsize` most recently used entries are kept."""
+
+    def decorator(func: Callable) -> Callable:
+        entries = OrderedDict()
+
+        @wraps(func)
+        def wrapper(*args):
+            value = entries.get(args, entries)
+            if value is entries:
+                value = entries[args] = func(*args)
+                if len(entries) > maxsize:
+                    entries.popitem(last=False)
+            else:
+                entries.move_to_end(args)
+            return value
+
+        wrapper.entries = entries
+        wrapper.cache_clear = entries.clear
+        CACHES[f"{func.__module__}.{func.__qualname__}"] = wrapper
+        return wrapper
+
+    return decorator
@@ -0,0 +1,140 @@
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pygame as pg
+from PIL import Image
+
+
+def _byte_order(surface: pg.Surface) -> str:
+    """The order of the color bytes in memory of a 32 bit surface, like "BGRA" or "BGRX"."""
+
+    if surface.get_bytesize() != 4:
+        raise ValueError("Only 32 bit surfaces can be captured")
+
+    names = ["X"] * 4
+    for name, shift, mask in zip("RGBA", surface.get_shifts(), surface.get_masks()):
+        if mask:
+            names[shift // 8] = name
+    return "".join(names)
+
+
+class FrameCapture:
+    """
+    Records frames of a surface without slowing down the game.
+
+    `grab` copies the raw pixels of the surface into one of a ring of preallocated
+    buffers, which is a single memory copy. A background thread writes the buffers as
+    raw frames, a PNG sequence or into a local ffmpeg process. If the writer falls
+    behind and no buffer is free, the frame is skipped for the recording and counted
+    in `dropped`, the game itself never waits.
+    """
+
+    def __init__(
+        self,
+        surface: pg.Surface,
+        path: str,
+        *,
+        mode: str = "raw",
+        fps: int = 60,
+        ring_size: int = 8,
+    ):
+        if mode not in ("raw", "png", "ffmpeg"):
+            raise ValueError(f"Unknown capture mode {mode}")
+
+        self.size = surface.get_size()
+        self.pitch = surface.get_pitch()
+        self.byte_order = _byte_order(surface)
+        self.path = path
+        self.mode = mode
+        self.fps = fps
+
+        self.buffers = [np.empty((self.size[1], self.pitch), np.uint8) for _ in range(ring_size)]
+        self.free: queue.SimpleQueue[int] = queue.SimpleQueue()
+        self.filled: queue.SimpleQueue[int | None] = queue.SimpleQueue()
+        for i in range(ring_size):
+            self.free.put(i)
+
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+
+        os.makedirs(path, exist_ok=True)
+        self.thread = threading.Thread(target=self._write_frames, daemon=True)
+        self.thread.start()
+
+    def grab(self, surface: pg.Surface):
+        if surface.get_size() != self.size:
+            raise ValueError("The captured surface changed its size")
+
+        try:
+            index = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return
+
+        # The buffer proxy locks the surface only during the copy
+        pixels = np.frombuffer(surface.get_buffer(), np.uint8)
+        np.copyto(self.buffers[index], pixels.reshape(self.size[1], self.pitch))
+        del pixels
+        self.filled.put(index)
+        self.captured += 1
+
+    def close(self):
+        """Wait until all grabbed frames are written."""
+        self.filled.put(None)
+        self.thread.join()
+
+    def _frame(self, index: int) -> np.ndarray | bytes:
+        # Only copy again if the rows of the surface were padded
+        frame = self.buffers[index][:, : self.size[0] * 4]
+        return frame if frame.flags.c_contiguous else frame.tobytes()
+
+    def _write_frames(self):
+        output = None
+        process = None
+        if self.mode == "raw":
+            name = f"frames_{self.size[0]}x{self.size[1]}_{self.byte_order.lower()}.raw"
+            output = open(os.path.join(self.path, name), "wb")
+        elif self.mode == "ffmpeg":
+            process = subprocess.Popen(
+                [
+                    "ffmpeg",
+                    "-loglevel", "error",
+                    "-y",
+                    "-f", "rawvideo",
+                    "-pix_fmt", self.byte_order.lower().replace("x", "0"),
+                    "-s", f"{self.size[0]}x{self.size[1]}",
+                    "-r", str(self.fps),
+                    "-i", "-",
+                    "-pix_fmt", "yuv420p",
+                    os.path.join(self.path, "capture.mp4"),
+                ],
+                stdin=subprocess.PIPE,
+            )
+            output = process.stdin
+
+        while (index := self.filled.get()) is not None:
+            if self.mode == "png":
+                # Pillow releases the GIL while encoding, unlike pg.image.save
+                image = Image.frombuffer(
+                    "RGB", self.size, self.buffers[index], "raw", self.byte_order, self.pitch, 1
+                )
+                image.save(os.path.join(self.path, f"{self.written:06}.png"), compress_level=1)
+            else:
+                output.write(self._frame(index))
+
+            self.free.put(index)
+            self.written += 1
+
+        if output:
+            output.close()
+        if process:
+            process.wait()
+
+
+def new_capture_path(root: str = "captures") -> str:
+    return os.path.join(root, time.strftime("%Y-%m-%d_%H-%M-%S"))
@@ -0,0 +1,265 @@
+import json
+import os
+from array import array
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from functools import cache
+
+import pygame as pg
+
+import tanks.store as store
+
+# Action bits of a tank, combined into one bitmask per tank and tick
+UP = 1
+DOWN = 2
+LEFT = 4
+RIGHT = 8
+SHOOT = 16
+TURRET_LEFT = 32
+TURRET_RIGHT = 64
+ACTIONS = {
+    "up": UP,
+    "down": DOWN,
+    "left": LEFT,
+    "right": RIGHT,
+    "shoot": SHOOT,
+    "turret_left": TURRET_LEFT,
+    "turret_right": TURRET_RIGHT,
+}
+
+# Bindings of the local players, overridden by the settings file at store.CONTROLS_PATH.
+# Keys are pygame key names, buttons are joystick button numbers.
+DEFAULT_BINDINGS = [
+    {
+        "keys": {
+            "up": ["w"],
+            "down": ["s"],
+            "left": ["a"],
+            "right": ["d"],
+            "shoot": ["space"],
+            "turret_left": ["y"],
+            "turret_right": ["x"],
+        },
+        "joystick": 0,
+        "buttons": {"shoot": [0], "turret_left": [4], "turret_right": [5]},
+    },
+    {
+        "keys": {
+            "up": ["up"],
+            "down": ["down"],
+            "left": ["left"],
+            "right": ["right"],
+            "shoot": ["return"],
+            "turret_left": ["."],
+            "turret_right": ["-"],
+        },
+        "joystick": 1,
+        "buttons": {"shoot": [0], "turret_left": [4], "turret_right": [5]},
+    },
+]
+# Stick deflection below this is ignored
+DEAD_ZONE = 0.4
+
+
+class ControlsError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Bindings:
+    """The controls of one local player, resolved to key codes and action bits."""
+
+    keys: tuple[tuple[int, int], ...]
+    joystick: int | None
+    buttons: tuple[tuple[int, int], ...]
+
+
+def _resolve(
+    player: int, kind: str, names: dict[str, list], to_code: Callable[[any], int]
+) -> tuple[tuple[int, int], ...]:
+    resolved = []
+    for action, inputs in names.items():
+        if action not in ACTIONS:
+            raise ControlsError(f"Player {player + 1}: unknown action {action}")
+        if not isinstance(inputs, list):
+            raise ControlsError(f"Player {player + 1}: expected a list of {kind}s for {action}")
+        for name in inputs:
+            try:
+                resolved.append((to_code(name), ACTIONS[action]))
+            except (ValueError, TypeError):
+                raise ControlsError(f"Player {player + 1}: invalid {kind} {name!r}") from None
+
+    return tuple(resolved)
+
+
+def _button(value: any) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError
+    return value
+
+
+def parse_bindings(data: list[dict[str, any]]) -> list[Bindings]:
+    """Validate the raw bindings of all players and resolve the key names."""
+
+    if not isinstance(data, list) or not data:
+        raise ControlsError("Controls need a list of players")
+
+    bindings = []
+    for i, player in enumerate(data):
+        joystick = player.get("joystick")
+        if joystick is not None and not isinstance(joystick, int):
+            raise ControlsError(f"Player {i + 1}: invalid joystick {joystick!r}")
+
+        bindings.append(
+            Bindings(
+                _resolve(i, "key", player.get("keys", {}), pg.key.key_code),
+                joystick,
+                _resolve(i, "button", player.get("buttons", {}), _button),
+            )
+        )
+
+    return bindings
+
+
+def load_bindings(path: str | None = None) -> list[Bindings]:
+    """
+    Load the bindings from the settings file. Players missing in the file keep their
+    default bindings, and a missing file means the defaults.
+    """
+
+    path = store.CONTROLS_PATH if path is None else path
+    data = list(DEFAULT_BINDINGS)
+    if os.path.exists(path):
+        with open(path) as f:
+            players = json.load(f)
+        if not isinstance(players, list):
+            raise ControlsError(f"{path}: expected a list of players")
+        data[: len(players)] = players
+
+    return parse_bindings(data)
+
+
+class Controls:
+    """
+    Samples the keyboard and the gamepads once per tick into an action bitmask per player.
+
+    Tanks of local players read their bitmask through `player(i)`, so the input costs
+    one sample per tick no matter how many tanks and keys there are.
+    """
+
+    def __init__(
+        self,
+        bindings: list[Bindings],
+        keyboard: Callable[[], Sequence[bool]] = pg.key.get_pressed,
+    ):
+        self.bindings = bindings
+        # Replaceable to script the keyboard, e.g. for soak tests
+        self.keyboard = keyboard
+        self.actions = [0] * len(bindings)
+        self.joysticks: dict[int, pg.joystick.JoystickType] = {}
+        self.refresh_joysticks()
+
+    def refresh_joysticks(self):
+        """Open the connected joysticks, call again when one was added or removed."""
+        self.joysticks = {i: pg.joystick.Joystick(i) for i in range(pg.joystick.get_count())}
+
+    def sample(self):
+        pressed = self.keyboard()
+
+        for i, bindings in enumerate(self.bindings):
+            action = 0
+            for key, bit in bindings.keys:
+                if pressed[key]:
+                    action |= bit
+
+            joystick = self.joysticks.get(bindings.joystick)
+            if joystick:
+                action |= self._sample_joystick(joystick, bindings)
+
+            self.actions[i] = action
+
+    def _sample_joystick(self, joystick: pg.joystick.JoystickType, bindings: Bindings) -> int:
+        action = 0
+        for button, bit in bindings.buttons:
+            if button < joystick.get_numbuttons() and joystick.get_button(button):
+                action |= bit
+
+        # Left stick and d-pad move the tank
+        x, y = 0.0, 0.0
+        if joystick.get_numaxes() >= 2:
+            x, y = joystick.get_axis(0), joystick.get_axis(1)
+        if joystick.get_numhats():
+            hat_x, hat_y = joystick.get_hat(0)
+            x, y = x + hat_x, y - hat_y
+
+        if x < -DEAD_ZONE:
+            action |= LEFT
+        elif x > DEAD_ZONE:
+            action |= RIGHT
+        if y < -DEAD_ZONE:
+            action |= UP
+        elif y > DEAD_ZONE:
+            action |= DOWN
+
+        return action
+
+    def player(self, i: int) -> "PlayerInput":
+        return PlayerInput(self, i)
+
+
+class PlayerInput:
+    """The input of a tank controlled by a local player."""
+
+    def __init__(self, controls: Controls, player: int):
+        self.controls = controls
+        self.player = player
+
+    def __call__(self) -> int:
+        return self.controls.actions[self.player]
+
+
+@cache
+def get_controls() -> Controls:
+    return Controls(load_bindings())
+
+
+class ActionInput:
+    """Input of a tank whose action is set from outside, e.g. by a bot or a network client."""
+
+    def __init__(self):
+        self.action = 0
+
+    def __call__(self) -> int:
+        return self.action
+
+
+class ReplayInput:
+    """
+    Plays back the actions of one tank from the action log of a match, see `Game.actions`.
+    The tank stands still once the log is over.
+    """
+
+    def __init__(self, actions: Sequence[int], num_tanks: int, tank: int):
+        self.actions = actions
+        self.num_tanks = num_tanks
+        self.index = tank
+
+    def __call__(self) -> int:
+        if self.index >= len(self.actions):
+            return 0
+
+        action = self.actions[self.index]
+        self.index += self.num_tanks
+        return action
+
+
+def save_actions(path: str, actions: array):
+    with open(path, "wb") as f:
+        actions.tofile(f)
+
+
+def load_actions(path: str) -> array:
+    actions = array("B")
+    with open(path, "rb") as f:
+        actions.frombytes(f.read())
+    return actions
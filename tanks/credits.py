@@ -1,6 +1,7 @@
 import pygame as pg
 
 import tanks.store as store
+from tanks.scenes import Scene, SceneManager
 
 
 CREDITS_TEXT = [
@@ -42,37 +43,25 @@ CREDITS_TEXT = [
 ]
 
 
-class TextLine:
-    def __init__(self, screen: pg.Surface, image: pg.Surface, pos: tuple[float, float]):
-        self.exact_y = pos[1]
-        self.screen = screen
-        self.image = image
-        self.rect = pg.Rect(pos, self.image.get_size())
+class Credits(Scene):
+    SIZE = (800, 600)
+    caption = "Credits"
+    animated = True
 
-    def draw(self):
-        self.screen.blit(self.image, self.rect)
-
-    def update(self):
-        self.exact_y -= 0.5
-        self.rect.y = self.exact_y
-
-
-class Credits:
     def __init__(self):
+        super().__init__()
         self.clock = pg.time.Clock()
-        self.SIZE = (800, 600)
-        self.screen = pg.display.set_mode(self.SIZE)
-        pg.display.set_caption("Credits")
-
-        self.running = True
+        self.screen = pg.Surface(self.SIZE)
 
-        self.text: list[TextLine] = []
+        # All lines are rendered once onto a tall strip that is scrolled through the window
+        self.strip: pg.Surface | None = None
+        self.last_line_y = 0
+        self.exact_y = self.SIZE[1]
         self.generate_text(CREDITS_TEXT)
 
-        self.loop()
-
     def generate_text(self, text: list[str]):
-        y = self.SIZE[1]
+        lines: list[tuple[pg.Surface, int]] = []
+        y = 0
 
         for line in text:
             if line.startswith("[h1]"):
@@ -84,38 +73,32 @@ class Credits:
             else:
                 font = store.SMALL_FONT
 
-            text_img = store.generate_text(line, font=font)
-            self.text.append(TextLine(
-                self.screen,
-                text_img,
-                (self.SIZE[0]/2 - text_img.get_width()/2, y)
-            ))
-
+            lines.append((store.generate_text(line, font=font), y))
+            self.last_line_y = y
             y += font.get_sized_height()
 
-    def loop(self):
-        while self.running:
-            pg.time.Clock().tick(store.FPS)
-
-            # Update
-            for text in self.text:
-                text.update()
+        self.strip = pg.Surface((self.SIZE[0], y))
+        self.strip.fill(store.BLACK)
+        for text_img, line_y in lines:
+            self.strip.blit(text_img, (self.SIZE[0] / 2 - text_img.get_width() / 2, line_y))
 
-            if self.text[-1].rect.y < 0:
-                self.running = False
+    def update(self):
+        self.clock.tick(store.FPS)
+        self.exact_y -= 0.5
 
-            # Draw
-            self.screen.fill(store.BLACK)
-            for text in self.text:
-                text.draw()
+        if int(self.exact_y) + self.last_line_y < 0:
+            self.manager.pop()
 
-            pg.display.flip()
+    def draw(self):
+        self.screen.fill(store.BLACK)
+        self.screen.blit(self.strip, (0, int(self.exact_y)))
 
-            # Quiting
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.running = False
+    def handle_event(self, event: pg.event.Event):
+        if event.type == pg.QUIT:
+            self.manager.pop()
 
 
 if __name__ == "__main__":
-    Credits()
+    manager = SceneManager(Credits.SIZE)
+    manager.push(Credits())
+    manager.run()
@@ -0,0 +1,183 @@
+from array import array
+from dataclasses import dataclass
+from math import cos, sin, radians
+from random import Random
+
+import pygame as pg
+
+import tanks.store as store
+from tanks.memory import tracked_cache
+
+
+@dataclass(frozen=True, slots=True)
+class EffectType:
+    frames: tuple[pg.Surface, ...]
+    # Offsets to draw each frame centered on the effect position
+    offsets: tuple[tuple[int, int], ...]
+    # Animation frames advanced per tick
+    speed: float
+    # Velocity multiplier per tick
+    drag: float = 1.0
+
+
+def _make_effect_type(frames: list[pg.Surface], speed: float, drag: float = 1.0) -> EffectType:
+    offsets = tuple((-frame.get_width() // 2, -frame.get_height() // 2) for frame in frames)
+    return EffectType(tuple(frames), offsets, speed, drag)
+
+
+def _explosion_frames(scale: float) -> list[pg.Surface]:
+    return [
+        pg.transform.scale_by(store.ASSETS[f"/images/proprietary/explosion/{i}.png"], scale)
+        for i in range(9)
+    ]
+
+
+def _circle_frames(
+    color: tuple[int, int, int], radii: list[int], alphas: list[int]
+) -> list[pg.Surface]:
+    frames = []
+    for radius, alpha in zip(radii, alphas):
+        frame = pg.Surface((radius * 2, radius * 2), pg.SRCALPHA)
+        pg.draw.circle(frame, (*color, alpha), (radius, radius), radius)
+        frames.append(frame)
+    return frames
+
+
+def _square_frames(color: tuple[int, int, int], sizes: list[int]) -> list[pg.Surface]:
+    frames = []
+    for size in sizes:
+        frame = pg.Surface((size, size))
+        frame.fill(color)
+        frames.append(frame)
+    return frames
+
+
+def _explosion() -> EffectType:
+    return _make_effect_type(_explosion_frames(1), 0.5)
+
+
+def _big_explosion() -> EffectType:
+    return _make_effect_type(_explosion_frames(2.5), 0.1)
+
+
+def _spark() -> EffectType:
+    frames = _circle_frames((255, 200, 64), [3, 3, 2, 2, 1], [255, 220, 180, 120, 60])
+    return _make_effect_type(frames, 0.4, 0.85)
+
+
+def _smoke() -> EffectType:
+    radii = list(range(6, 22, 2))
+    alphas = [140 - i * 16 for i in range(len(radii))]
+    return _make_effect_type(_circle_frames(store.GRAY, radii, alphas), 0.1, 0.95)
+
+
+def _debris() -> EffectType:
+    return _make_effect_type(_square_frames(store.DARK_GRAY, [5, 5, 4, 4, 3, 3, 2]), 0.15, 0.9)
+
+
+EFFECT_TYPES = {
+    "explosion": _explosion,
+    "big_explosion": _big_explosion,
+    "spark": _spark,
+    "smoke": _smoke,
+    "debris": _debris,
+}
+
+
+@tracked_cache
+def _load_effect_type(name: str, scale: float = 1) -> EffectType:
+    """Pre-render the frames of an effect type once per render scale on first use."""
+    if scale == 1:
+        return EFFECT_TYPES[name]()
+
+    effect_type = _load_effect_type(name, 1)
+    frames = [pg.transform.scale_by(frame, scale) for frame in effect_type.frames]
+    return _make_effect_type(frames, effect_type.speed, effect_type.drag)
+
+
+class Effects:
+    """
+    All live effects of a game, stored in parallel arrays.
+
+    Effects are updated in one loop and drawn in a single `blits` call, so many
+    simultaneous explosions and particles stay cheap.
+    """
+
+    def __init__(self, rng: Random | None = None):
+        self.rng = rng or Random()
+        self.types: list[EffectType] = []
+        self.type_indices: dict[str, int] = {}
+        # Lowered by the quality governor
+        self.particles = 1.0
+        self.frame_step = 1
+        # Positions are in game coordinates and scaled when drawing
+        self.scale = 1.0
+
+        self.kind = array("H")
+        self.frame = array("f")
+        self.x = array("f")
+        self.y = array("f")
+        self.vx = array("f")
+        self.vy = array("f")
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def _get_type_index(self, name: str) -> int:
+        if name not in self.type_indices:
+            self.type_indices[name] = len(self.types)
+            self.types.append(_load_effect_type(name, self.scale))
+        return self.type_indices[name]
+
+    def set_scale(self, scale: float):
+        self.scale = scale
+        self.types = [_load_effect_type(name, scale) for name in self.type_indices]
+
+    def spawn(self, name: str, pos: tuple[float, float], velocity: tuple[float, float] = (0, 0)):
+        self.kind.append(self._get_type_index(name))
+        self.frame.append(0)
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.vx.append(velocity[0])
+        self.vy.append(velocity[1])
+
+    def burst(self, name: str, pos: tuple[float, float], count: int, speed: float):
+        """Spawn `count` particles flying in random directions."""
+        for _ in range(int(count * self.particles)):
+            angle = radians(self.rng.uniform(0, 360))
+            particle_speed = self.rng.uniform(0.3, 1) * speed
+            self.spawn(name, pos, (sin(angle) * particle_speed, cos(angle) * particle_speed))
+
+    def _remove(self, i: int):
+        # Swap with the last effect so removing stays O(1)
+        for values in (self.kind, self.frame, self.x, self.y, self.vx, self.vy):
+            values[i] = values[-1]
+            values.pop()
+
+    def update(self):
+        i = 0
+        while i < len(self.kind):
+            effect_type = self.types[self.kind[i]]
+            self.frame[i] += effect_type.speed * self.frame_step
+            if self.frame[i] >= len(effect_type.frames):
+                self._remove(i)
+                continue
+
+            self.vx[i] *= effect_type.drag
+            self.vy[i] *= effect_type.drag
+            self.x[i] += self.vx[i]
+            self.y[i] += self.vy[i]
+            i += 1
+
+    def draw(self, screen: pg.Surface):
+        types = self.types
+        scale = self.scale
+        batch = []
+        for kind, frame, x, y in zip(self.kind, self.frame, self.x, self.y):
+            effect_type = types[kind]
+            offset = effect_type.offsets[int(frame)]
+            batch.append(
+                (effect_type.frames[int(frame)], (x * scale + offset[0], y * scale + offset[1]))
+            )
+
+        screen.blits(batch, doreturn=False)
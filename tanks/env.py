@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+from math import cos, radians, sin
+from random import Random, choice
+
+# Environments never open a window or play sounds
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+
+import tanks.store as store
+from tanks.controls import ActionInput, ReplayInput
+from tanks.game import Game, Tank, Bullet
+from tanks.map_compiler import compile_map
+from tanks.map_generator import STRESS_SIZES, register_corpus
+
+TILE_CODES = {"e": 0, "w": 1, "s": 2}
+TANK_FEATURES = 10
+SHELL_FEATURES = 5
+WIN_REWARD = 10.0
+
+
+class VecEnv:
+    """
+    Steps several independent headless matches in lockstep.
+
+    Observations are written into NumPy arrays that are allocated once and reused
+    on every step:
+
+    - `tiles` (envs, height, width) uint8, see `TILE_CODES`. Only rewritten on reset
+      or when a wall breaks.
+    - `tank_obs` (envs, tanks, TANK_FEATURES) float32: x, y, velocity x, velocity y,
+      sin and cos of the turret angle, health and ammo fraction, shot ready and destroyed.
+    - `shell_obs` (envs, max_shells, SHELL_FEATURES) float32: x, y, direction x,
+      direction y and team index, with `shell_mask` marking the used rows.
+
+    Finished matches are reset automatically.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        tank_types: list[str],
+        map_paths: list[str] | None = None,
+        *,
+        max_shells: int = 64,
+        max_steps: int = 60 * store.FPS,
+    ):
+        self.num_envs = num_envs
+        self.tank_types = tank_types
+        self.map_paths = map_paths or [
+            path for path in store.ASSETS if path.startswith("/maps/")
+        ]
+        self.max_steps = max_steps
+
+        num_tanks = len(tank_types)
+        compiled_maps = [compile_map(store.ASSETS[path]) for path in self.map_paths]
+        height = max(compiled_map.height for compiled_map in compiled_maps)
+        width = max(compiled_map.width for compiled_map in compiled_maps)
+
+        self.tiles = np.zeros((num_envs, height, width), np.uint8)
+        self.tank_obs = np.zeros((num_envs, num_tanks, TANK_FEATURES), np.float32)
+        self.shell_obs = np.zeros((num_envs, max_shells, SHELL_FEATURES), np.float32)
+        self.shell_mask = np.zeros((num_envs, max_shells), np.bool_)
+        self.rewards = np.zeros((num_envs, num_tanks), np.float32)
+        self.dones = np.zeros(num_envs, np.bool_)
+
+        self.health = np.zeros((num_envs, num_tanks), np.float32)
+        self.steps = np.zeros(num_envs, np.int64)
+
+        self.games: list[Game | None] = [None] * num_envs
+        self.tanks: list[list[Tank]] = [[] for _ in range(num_envs)]
+        self.inputs = [[ActionInput() for _ in range(num_tanks)] for _ in range(num_envs)]
+        self.map_versions = [0] * num_envs
+
+        self.total_steps = 0
+        self.total_time = 0.0
+
+    @property
+    def observations(self) -> dict[str, np.ndarray]:
+        return {
+            "tiles": self.tiles,
+            "tanks": self.tank_obs,
+            "shells": self.shell_obs,
+            "shell_mask": self.shell_mask,
+        }
+
+    @property
+    def steps_per_second(self) -> float:
+        """Env steps per second over all `step` calls so far."""
+        return self.total_steps / self.total_time if self.total_time else 0.0
+
+    def reset(self) -> dict[str, np.ndarray]:
+        for i in range(self.num_envs):
+            self.reset_env(i)
+        return self.observations
+
+    def reset_env(self, i: int):
+        game = Game(
+            choice(self.map_paths),
+            [
+                {
+                    "type": tank_type,
+                    "color": j % 5 + 1,
+                    "input": self.inputs[i][j],
+                }
+                for j, tank_type in enumerate(self.tank_types)
+            ],
+            headless=True,
+        )
+        self.games[i] = game
+        self.tanks[i] = [entity for entity in game.entities if isinstance(entity, Tank)]
+        self.steps[i] = 0
+        self.health[i] = [tank.health for tank in self.tanks[i]]
+
+        self.write_tiles(i)
+        self.write_entities(i)
+
+    def step(self, actions: np.ndarray) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """
+        Advance all matches by one tick.
+
+        Args:
+            actions (np.ndarray): The action bitmask of every tank, shape (envs, tanks), see
+                the action bits in `controls`.
+
+        Returns:
+            tuple: The observations, the rewards (envs, tanks) and the done flags (envs).
+        """
+
+        start = time.perf_counter()
+
+        for i, game in enumerate(self.games):
+            for action_input, action in zip(self.inputs[i], actions[i]):
+                action_input.action = int(action)
+
+            game.step()
+            self.steps[i] += 1
+
+            if game.map_handler.version != self.map_versions[i]:
+                self.write_tiles(i)
+            self.write_entities(i)
+            self.write_rewards(i)
+
+            self.dones[i] = game.end_animation_frame > 0 or self.steps[i] >= self.max_steps
+            if self.dones[i]:
+                self.reset_env(i)
+
+        self.total_steps += self.num_envs
+        self.total_time += time.perf_counter() - start
+
+        return self.observations, self.rewards, self.dones
+
+    def write_tiles(self, i: int):
+        game = self.games[i]
+        tiles = self.tiles[i]
+        tiles.fill(TILE_CODES["w"])
+        for y, row in enumerate(game.map_handler.tile_map):
+            tiles[y, : len(row)] = [TILE_CODES[tile] for tile in row]
+        self.map_versions[i] = game.map_handler.version
+
+    def write_entities(self, i: int):
+        game = self.games[i]
+        time_now = game.get_time()
+
+        tank_obs = self.tank_obs[i]
+        for j, tank in enumerate(self.tanks[i]):
+            angle = radians(tank.turret_angle)
+            tank_obs[j] = (
+                tank.box.centerx,
+                tank.box.centery,
+                *tank.get_velocity(),
+                sin(angle),
+                cos(angle),
+                tank.health / tank.stats.health,
+                tank.current_ammo / tank.stats.max_shells,
+                time_now - tank.last_shot > tank.stats.cooldown and tank.current_ammo > 0,
+                tank.is_destroyed,
+            )
+
+        shell_obs = self.shell_obs[i]
+        shell_mask = self.shell_mask[i]
+        shell_mask.fill(False)
+        teams = [tank.team for tank in self.tanks[i]]
+        count = 0
+        for entity in game.entities:
+            if not isinstance(entity, Bullet):
+                continue
+            if count == len(shell_mask):
+                break
+
+            angle = radians(entity.angle)
+            shell_obs[count] = (
+                entity.box.centerx,
+                entity.box.centery,
+                sin(angle),
+                cos(angle),
+                teams.index(entity.team),
+            )
+            shell_mask[count] = True
+            count += 1
+        shell_obs[count:] = 0
+
+    def write_rewards(self, i: int):
+        """Reward damage dealt to the other team and punish damage taken."""
+
+        rewards = self.rewards[i]
+        health = self.health[i]
+        tanks = self.tanks[i]
+
+        for j, tank in enumerate(tanks):
+            rewards[j] = 0.0
+            lost = health[j] - max(tank.health, 0)
+            for k, other in enumerate(tanks):
+                if j == k:
+                    continue
+                other_lost = health[k] - max(other.health, 0)
+                rewards[j] += other_lost if other.team != tank.team else 0
+                if other.is_destroyed and other_lost:
+                    rewards[j] += WIN_REWARD if other.team != tank.team else -WIN_REWARD
+            rewards[j] -= lost
+            if tank.is_destroyed and lost:
+                rewards[j] -= WIN_REWARD
+
+        for j, tank in enumerate(tanks):
+            health[j] = max(tank.health, 0)
+
+
+def benchmark(num_envs: int = 16, steps: int = 1000, map_paths: list[str] | None = None):
+    """Step random actions and report the throughput in env steps per second."""
+
+    env = VecEnv(num_envs, ["/types/tank.json", "/types/sniper.json"], map_paths)
+    env.reset()
+    rng = np.random.default_rng()
+    actions = np.zeros((num_envs, len(env.tank_types)), np.uint8)
+
+    for _ in range(steps):
+        actions[:] = rng.integers(0, 128, actions.shape)
+        env.step(actions)
+
+    print(f"{env.steps_per_second:.0f} env steps per second with {num_envs} envs")
+
+
+def stress_benchmark(num_envs: int = 4, steps: int = 200):
+    """Run the benchmark on generated maps of every stress corpus size."""
+
+    for size in STRESS_SIZES:
+        print(f"{size[0]}x{size[1]}: ", end="")
+        benchmark(num_envs, steps, register_corpus(sizes=(size,), count=num_envs))
+
+
+def check_replay(
+    map_path: str, tank_types: list[str], steps: int = 1000, seed: int = 0
+) -> int | None:
+    """
+    Play a deterministic match with random actions, then replay its action log with the
+    same seed. Returns the first tick whose checksum differs, or None if all match.
+    """
+
+    def play(inputs) -> Game:
+        game = Game(
+            map_path,
+            [
+                {"type": tank_type, "color": j % 5 + 1, "input": inputs[j]}
+                for j, tank_type in enumerate(tank_types)
+            ],
+            headless=True,
+            seed=seed,
+        )
+        for _ in range(steps):
+            game.step()
+        return game
+
+    deterministic = store.DETERMINISTIC
+    store.DETERMINISTIC = True
+    try:
+        rng = Random(seed)
+        original = play([lambda: rng.randrange(128)] * len(tank_types))
+        replay = play(
+            [ReplayInput(original.actions, len(tank_types), j) for j in range(len(tank_types))]
+        )
+    finally:
+        store.DETERMINISTIC = deterministic
+
+    for tick, (expected, actual) in enumerate(zip(original.checksums, replay.checksums), 1):
+        if expected != actual:
+            return tick
+    return None
+
+
+def deterministic_benchmark(num_envs: int = 16, steps: int = 1000):
+    """Compare the throughput of the float and the deterministic mode and check a replay."""
+
+    deterministic = store.DETERMINISTIC
+    try:
+        for store.DETERMINISTIC in (False, True):
+            print("Deterministic: " if store.DETERMINISTIC else "Float: ", end="")
+            benchmark(num_envs, steps)
+    finally:
+        store.DETERMINISTIC = deterministic
+
+    tick = check_replay("/maps/gras1.txt", ["/types/tank.json", "/types/sniper.json"])
+    print("Replay matches" if tick is None else f"Replay differs from tick {tick}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["stress"]:
+        stress_benchmark()
+    elif sys.argv[1:] == ["deterministic"]:
+        deterministic_benchmark()
+    else:
+        benchmark()
@@ -0,0 +1,38 @@
+from math import radians, sin
+
+# Fixed point numbers are ints in 1/ONE units, used by the deterministic mode
+FRACTION_BITS = 16
+ONE = 1 << FRACTION_BITS
+HALF = ONE >> 1
+
+# Sine of every whole degree. Rounding to 16 bits is far coarser than the error of any
+# libm, so the table is the same on every machine.
+SIN = tuple(round(sin(radians(angle)) * ONE) for angle in range(360))
+
+
+def to_fixed(value: float) -> int:
+    return round(value * ONE)
+
+
+def to_float(value: int) -> float:
+    # Exact, since ONE is a power of two
+    return value / ONE
+
+
+def mul(a: int, b: int) -> int:
+    """Multiply two fixed point numbers, rounding towards zero so signs stay symmetric."""
+    product = a * b
+    return product >> FRACTION_BITS if product >= 0 else -(-product >> FRACTION_BITS)
+
+
+def to_pixels(value: int) -> int:
+    """Round to whole pixels half away from zero, like `pg.Rect` rounds floats."""
+    return (value + HALF) >> FRACTION_BITS if value >= 0 else -((-value + HALF) >> FRACTION_BITS)
+
+
+def fsin(angle: int) -> int:
+    return SIN[angle % 360]
+
+
+def fcos(angle: int) -> int:
+    return SIN[(angle + 90) % 360]
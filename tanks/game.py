@@ -1,66 +1,145 @@
+import copy
+import zlib
+from array import array
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from functools import cache
-from math import sin, cos, radians
-from random import choice, randint
+from math import sin, cos, radians, ceil, hypot
+from random import Random, getrandbits
 
 import pygame as pg
 
 import tanks.store as store
+from tanks import fixed, memory
+from tanks.audio import NullAudio, get_audio
+from tanks.broadcast import get_spectator_server
+from tanks.capture import FrameCapture, new_capture_path
+from tanks.controls import (
+    Controls, DOWN, LEFT, RIGHT, SHOOT, TURRET_LEFT, TURRET_RIGHT, UP, get_controls
+)
+from tanks.effects import Effects
+from tanks.map_compiler import TILE_SIZE, compile_map, merge_walls
+from tanks.quality import QualityGovernor
+from tanks.render import BODIES, SHELLS, TURRETS, RenderQueue
+from tanks.scenes import Scene
+from tanks.telemetry import get_telemetry
+from tanks.tank_types import get_tank_type, get_tank_sprites
+from tanks.visibility import FogOfWar
 
 
 def _limit(value: int | float, min_value: int, max_value: int):
     return max(min(value, max_value), min_value)
 
 
-@cache
+def _pixel_collision() -> bool:
+    # Rotated masks differ between platforms, so deterministic matches collide boxes
+    return store.PIXEL_COLLISION and not store.DETERMINISTIC
+
+
+def _quantise(angle: float, step: int) -> int:
+    # Wrapped to 0-359, so a spinning turret only ever needs 360 / step rotated images
+    return int(round(angle / step) * step) % 360
+
+
+@memory.tracked_cache
 def _rotate_surface(surface: pg.Surface, angle: int):
     return pg.transform.rotate(surface, angle)
 
 
-@cache
+@memory.tracked_cache
 def _scale_surface(surface: pg.Surface, size: tuple[int, int]):
     return pg.transform.scale(surface, size)
 
 
-@cache
+@memory.tracked_cache
 def _scale_surface_by(surface: pg.Surface, factor: float):
     return pg.transform.scale_by(surface, factor)
 
 
-@cache
 def _rot_center(image, angle, pos: tuple[int, int]) -> tuple[pg.Surface, pg.Rect]:
     rotated_image = _rotate_surface(image, angle)
     new_rect = rotated_image.get_rect(center=image.get_rect(center=(pos[0], pos[1])).center)
     return rotated_image, new_rect
 
 
-@cache
+@memory.bounded_cache(store.MASK_CACHE_SIZE)
+def _sprite_mask(surface: pg.Surface, angle: int) -> pg.mask.Mask:
+    return pg.mask.from_surface(_rotate_surface(surface, angle))
+
+
+@memory.tracked_cache
+def _box_mask(size: tuple[int, int]) -> pg.mask.Mask:
+    return pg.mask.Mask(size, fill=True)
+
+
+@memory.tracked_cache
 def _get_shadow(size: tuple[int, int], opacity: int) -> pg.Surface:
     shadow = pg.Surface(size, pg.SRCALPHA)
     shadow.fill((0, 0, 0, opacity))
     return shadow
 
 
-def for_tiles(game_map: list[list[str]], draw_func: callable):
-    for y, row in enumerate(game_map):
-        for x, tile in enumerate(row):
-            draw_func(tile, x, y)
+def _fit_window(size: tuple[int, int]) -> tuple[int, int]:
+    """Shrink a window size to fit on the desktop, keeping the aspect ratio."""
+    desktop = pg.display.get_desktop_sizes()[0]
+    factor = min(1, desktop[0] * 0.9 / size[0], desktop[1] * 0.9 / size[1])
+    return int(size[0] * factor), int(size[1] * factor)
+
+
+@cache
+def _get_bake_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(thread_name_prefix="bake")
 
 
-def get_tanks_stats(tank_path: str) -> store.TankStats:
-    return store.TankStats(**store.ASSETS[tank_path])
+def _tile_pos(surface: pg.Surface, x: int, y: int) -> tuple[int, int]:
+    """Position of the tile x, y on the map surface or on a region subsurface of it."""
+    offset_x, offset_y = surface.get_abs_offset()
+    return x * 32 - offset_x, y * 32 - offset_y
 
 
 class Map:
-    def __init__(self, map_path: str):
-        self.SIZE = (1600, 800)
-        self.surface = pg.Surface(self.SIZE)
+    # Rows of tiles baked together by one worker, see `draw`
+    REGION_ROWS = 8
+    # How much darker than the image random variants of a tile type can be
+    MAX_DARKNESS = {"e": 16, "w": 64}
+
+    def __init__(self, map_path: str, seed: int | None = None, *, bake: bool = True):
+        compiled_map = compile_map(store.ASSETS[map_path])
+        self.SIZE = (compiled_map.width * TILE_SIZE, compiled_map.height * TILE_SIZE)
+        # Maps of headless games only keep their tiles, see `bake`
+        self.surface = pg.Surface(self.SIZE) if bake else None
 
         self.tank_spawns: list[tuple[int, int]] = []
         self.image = None
         self.tile_map: list[list[str]] = []
+        if bake:
+            memory.BAKED_MAPS.add(self)
+        # Random rotation, darkness and bush of each tile, kept so tiles can be redrawn
+        self.tile_variants: dict[tuple[int, int], tuple[int, int, int]] = {}
+        # The same seed bakes the same map, no matter how many cores bake it
+        self.seed = getrandbits(32) if seed is None else seed
+        self.rng = Random(self.seed)
+        self.wall_health: dict[tuple[int, int], int] = {}
+        # Incremented whenever a tile changes
+        self.version = 0
 
         self.load(store.ASSETS[map_path])
-        self.draw()
+        if bake:
+            self.draw()
+
+    def copy(self) -> "Map":
+        """A copy a match can change without changing this map, cheaper than baking again."""
+
+        game_map = copy.copy(self)
+        game_map.surface = self.surface.copy()
+        game_map.image = self.image.copy()
+        game_map.tile_map = [row.copy() for row in self.tile_map]
+        game_map.tile_variants = self.tile_variants.copy()
+        game_map.wall_health = self.wall_health.copy()
+        game_map.rng = Random()
+        game_map.rng.setstate(self.rng.getstate())
+        memory.BAKED_MAPS.add(game_map)
+        return game_map
 
     def get_map(self) -> pg.Surface:
         if not self.image:
@@ -69,151 +148,502 @@ class Map:
         return self.image
 
     def load(self, text: str):
-        rows = text.split("\n")
-        self.tile_map = [row.split(" ") for row in rows]
+        compiled_map = compile_map(text)
+        self.tile_map = [list(row) for row in compiled_map.tile_map]
+        self.tank_spawns = list(compiled_map.spawns)
 
     def draw(self):
-        for_tiles(self.tile_map, self.draw_grass)
-        for_tiles(self.tile_map, self.draw_shadow)
-        for_tiles(self.tile_map, self.draw_wall)
-        for_tiles(self.tile_map, self.draw_spawns)
+        """
+        Bake the map image. Bands of `REGION_ROWS` rows are drawn by a thread pool into
+        their own subsurfaces of the map surface, pygame releases the GIL while blitting.
+        """
+
+        regions = range(0, len(self.tile_map), self.REGION_ROWS)
+        # Consume the results, so errors of the workers are raised here
+        list(_get_bake_pool().map(self.draw_region, regions))
+
+        self.image = self.surface.copy()
+
+    def draw_region(self, top: int):
+        bottom = min(top + self.REGION_ROWS, len(self.tile_map))
+        width = len(self.tile_map[0])
+        surface = self.surface.subsurface((0, top * 32, width * 32, (bottom - top) * 32))
+
+        # Each region has its own random variants, so the result doesn't depend on the
+        # order the regions are baked in
+        rng = Random(f"{self.seed}/{top}")
+        for y in range(top, bottom):
+            for x in range(width):
+                if self.tile_map[y][x] in self.MAX_DARKNESS:
+                    self.get_tile_variant(x, y, rng)
+
+        for draw_func in (self.draw_grass, self.draw_shadow, self.draw_wall, self.draw_spawns):
+            # Only shadows reach into the next region, the subsurface clips everything else
+            first = max(top - 1, 0) if draw_func == self.draw_shadow else top
+            for y in range(first, bottom):
+                for x, tile in enumerate(self.tile_map[y]):
+                    draw_func(surface, tile, x, y)
+
+    def redraw_tile(self, x: int, y: int):
+        """Redraw a single tile and the neighbouring tiles its shadow falls on."""
+
+        area = self.tile_area(x, y)
+        neighbours = [
+            (nx, ny)
+            for ny in range(max(y - 1, 0), min(y + 2, len(self.tile_map)))
+            for nx in range(max(x - 1, 0), min(x + 2, len(self.tile_map[ny])))
+        ]
+
+        self.surface.set_clip(area)
+        self.surface.fill((0, 0, 0), area)
+        for draw_func in (self.draw_grass, self.draw_shadow, self.draw_wall, self.draw_spawns):
+            for nx, ny in neighbours:
+                draw_func(self.surface, self.tile_map[ny][nx], nx, ny)
+        self.surface.set_clip(None)
+
+        self.image.blit(self.surface, area, area)
+
+    def tile_area(self, x: int, y: int) -> pg.Rect:
+        """The area changed when the tile x, y is redrawn, including its shadow."""
+        return pg.Rect(x * 32, y * 32, 64, 64).clip(pg.Rect((0, 0), self.SIZE))
+
+    def get_tile_variant(self, x: int, y: int, rng: Random | None = None) -> tuple[int, int, int]:
+        if (x, y) not in self.tile_variants:
+            rng = rng or self.rng
+            self.tile_variants[(x, y)] = (
+                rng.choice([0, 90, 180, -90]),
+                rng.randint(0, self.MAX_DARKNESS[self.tile_map[y][x]]),
+                rng.randint(1, 100),
+            )
 
-        buffer = pg.image.tostring(self.surface, "RGB")
-        self.image = pg.image.frombuffer(buffer, self.SIZE, "RGB")
+        return self.tile_variants[(x, y)]
 
-    def draw_grass(self, tile: str, x: int, y: int):
+    def is_destructible(self, x: int, y: int) -> bool:
+        # The outer walls keep everything inside the map
+        return 0 < y < len(self.tile_map) - 1 and 0 < x < len(self.tile_map[y]) - 1
+
+    def damage_wall(self, x: int, y: int, amount: int) -> bool:
+        """Damage the wall at the tile x, y. Returns True if the wall broke."""
+
+        if self.tile_map[y][x] != "w" or not self.is_destructible(x, y):
+            return False
+
+        health = self.wall_health.get((x, y), store.WALL_HEALTH) - amount
+        if health > 0:
+            self.wall_health[(x, y)] = health
+            return False
+
+        self.wall_health.pop((x, y), None)
+        self.tile_variants.pop((x, y), None)
+        self.tile_map[y][x] = "e"
+        self.version += 1
+        if self.image:
+            self.redraw_tile(x, y)
+        return True
+
+    def draw_grass(self, surface: pg.Surface, tile: str, x: int, y: int):
         if tile == "e":
+            pos = _tile_pos(surface, x, y)
+            angle, darkness, number = self.get_tile_variant(x, y)
             scaled_img = _scale_surface(store.ASSETS["/images/tiles/grass.png"], (32, 32))
-            rotated_img = _rotate_surface(scaled_img, choice([0, 90, 180, -90]))
+            rotated_img = _rotate_surface(scaled_img, angle)
 
             # Randomly rotate the image
-            self.surface.blit(rotated_img, (x * 32, y * 32))
+            surface.blit(rotated_img, pos)
 
             # Make the image randomly darker
-            shadow = _get_shadow((32, 32), randint(0, 16))
-            self.surface.blit(shadow, (x * 32, y * 32))
+            shadow = _get_shadow((32, 32), darkness)
+            surface.blit(shadow, pos)
 
             # Add some bushes
-            number = randint(1, 100)
             if number <= 3:
-                self.surface.blit(store.ASSETS["/images/tiles/bush3.png"], (x * 32, y * 32))
+                surface.blit(store.ASSETS["/images/tiles/bush3.png"], pos)
 
             if 4 <= number <= 6:
-                self.surface.blit(store.ASSETS["/images/tiles/bush4.png"], (x * 32, y * 32))
+                surface.blit(store.ASSETS["/images/tiles/bush4.png"], pos)
 
-    def draw_shadow(self, tile: str, x: int, y: int):
+    def draw_shadow(self, surface: pg.Surface, tile: str, x: int, y: int):
         if tile == "w":
             shadow = _get_shadow((32, 32), 128)
-            self.surface.blit(shadow, (x * 32 + 5, y * 32 + 5))
+            pos = _tile_pos(surface, x, y)
+            surface.blit(shadow, (pos[0] + 5, pos[1] + 5))
 
-    def draw_wall(self, tile: str, x: int, y: int):
+    def draw_wall(self, surface: pg.Surface, tile: str, x: int, y: int):
         if tile == "w":
+            pos = _tile_pos(surface, x, y)
+            angle, darkness, _ = self.get_tile_variant(x, y)
             scaled_img = _scale_surface(store.ASSETS["/images/tiles/wall.png"], (32, 32))
             # Randomly rotate the image
-            rotated_img = _rotate_surface(scaled_img, choice([0, 90, 180, -90]))
+            rotated_img = _rotate_surface(scaled_img, angle)
 
-            self.surface.blit(rotated_img, (x * 32, y * 32))
+            surface.blit(rotated_img, pos)
             # Make the image randomly darker
-            shadow = _get_shadow((32, 32), randint(0, 64))
-            self.surface.blit(shadow, (x * 32, y * 32))
+            shadow = _get_shadow((32, 32), darkness)
+            surface.blit(shadow, pos)
 
-    def draw_spawns(self, tile: str, x: int, y: int):
+    def draw_spawns(self, surface: pg.Surface, tile: str, x: int, y: int):
         if tile == "s":
             img = store.ASSETS["/images/tiles/lodestone_top.png"]
             scaled_img = _scale_surface(img, (32, 32))
-            self.surface.blit(scaled_img, (x * 32, y * 32))
+            surface.blit(scaled_img, _tile_pos(surface, x, y))
+
 
+class Game(Scene):
+    caption = "Tanks"
+    animated = True
 
-class Game:
     def __init__(
         self,
         map_type: str,
         tanks: list[dict[str, any]],
+        *,
+        headless: bool = False,
+        game_map: Map | None = None,
+        seed: int | None = None,
     ):
-        self.SIZE = (1600, 800)
+        """
+        Set up a match. Push it onto a `SceneManager` to play it.
+
+        Args:
+            map_type (str): The asset path of the map.
+            tanks (list[dict[str, any]]): The type and color of each tank, and either the
+                local "player" controlling it or an "input" callable returning its action
+                bitmask, e.g. for bots, replays and network clients.
+            headless (bool): The match is never drawn or heard, only advanced by calling
+                `step`. Its map image isn't baked.
+            game_map (Map | None): An already baked map of `map_type`, e.g. from the
+                `Prewarmer`. It is changed by the match, so don't reuse it.
+            seed (int | None): Seed of all random streams of the match, random if None.
+        """
+
+        super().__init__()
+        self.map_type = map_type
+
+        # Every random stream of the match is derived from its seed
+        self.seed = getrandbits(32) if seed is None else seed
+        self.rng = Random(self.seed)
+
+        # Drawn even for a prepared map, so the other streams don't depend on it
+        map_seed = self.rng.getrandbits(32)
+
+        # The logical size of the game is the size of the map
+        self.map_handler = game_map or Map(map_type, map_seed, bake=not headless)
+        self.SIZE = self.map_handler.SIZE
         self.running = True
-        self.screen = pg.display.set_mode(self.SIZE)
-        pg.display.set_caption("Tanks")
+        self.headless = headless
+        self.audio = NullAudio() if headless else get_audio()
+        # Set when the players asked for the same match again after it ended
+        self.rematch = False
+
+        # The game is drawn onto the screen at the render scale, the scene manager scales
+        # it onto the window
+        self.scale = 1.0
+
         self.clock = pg.time.Clock()
+        self.governor = QualityGovernor(1000 / store.FPS)
+        self.quality = self.governor.level
+        self.memory_text: list[pg.Surface] = []
         self.end_animation_frame = 0
+        # Simulation ticks since the start of the match
+        self.frame = 0
 
         self.map_img = None
         self.entities: list[Entity] = []
+        self.effects = Effects(Random(self.rng.getrandbits(32)))
+        self.render_queue = RenderQueue()
+        # The wall collider covering each wall tile
+        self.wall_colliders: dict[tuple[int, int], Entity] = {}
 
-        self.map_handler = Map(map_type)
-        self.map_img = self.map_handler.get_map()
-        self.tank_spawns: list[tuple[int, int]] = []
+        self.compiled_map = compile_map(store.ASSETS[map_type])
+        self.tank_spawns: list[tuple[int, int]] = list(self.compiled_map.spawns)
         self.calculate_map()
+        self.fog: FogOfWar | None = None
+        if not headless:
+            self.set_render_scale(store.RENDER_SCALE * self.quality.render_scale)
+
+        self.capture: FrameCapture | None = None
+        if store.CAPTURE and not headless:
+            self.capture = FrameCapture(
+                self.screen, new_capture_path(), mode=store.CAPTURE, fps=store.FPS
+            )
+
+        # Keyboard and gamepads are sampled once per tick for all local players
+        self.controls: Controls | None = None
+        if any("input" not in tank for tank in tanks):
+            self.controls = get_controls()
+            # Pads plugged in while another scene was shown only sent their events there
+            self.controls.refresh_joysticks()
+        # The action bitmask of every tank and tick, in tank order, for replays
+        self.actions = array("B")
+        # The state checksum of every tick in deterministic mode, see `checksum`
+        self.checksums = array("I")
+
+        self.telemetry = get_telemetry()
+        self.match_id = self.telemetry.start_match(map_type, [tank["type"] for tank in tanks])
+        self.spectators = get_spectator_server()
 
         teams = ["red", "blue"]
+        self.tanks: list[Tank] = []
         for i, tank in enumerate(tanks):
-            self.entities.append(
+            self.tanks.append(
                 Tank(
                     self,
                     self.tank_spawns[i],
                     tank["type"],
-                    tank["keys"],
                     teams[i % 2],
                     tank["color"],
+                    tank.get("input") or self.controls.player(tank["player"]),
                 )
             )
+            self.tanks[-1].id = i
+        self.entities.extend(self.tanks)
 
-        self.game_loop()
+        if store.FOG_OF_WAR:
+            self.fog = FogOfWar(self, store.FOG_TEAM, store.FOG_RADIUS, store.FOG_DARKNESS)
+            self.fog.update()
 
     def calculate_map(self):
-        for_tiles(self.map_handler.tile_map, self.place_wall)
-        for_tiles(self.map_handler.tile_map, self.get_spawns)
+        # One collider per merged wall rect instead of one per tile
+        for wall in self.compiled_map.walls:
+            self.place_wall(wall)
 
-    def place_wall(self, tile: str, x: int, y: int):
-        if tile == "w":
-            self.entities.append(Entity(self, (x * 32, y * 32), "block", None, True, (32, 32)))
+    def place_wall(self, rect: tuple[int, int, int, int]):
+        wall = Entity(self, rect[:2], "block", None, True, rect[2:])
+        self.entities.append(wall)
 
-    def get_spawns(self, tile: str, x: int, y: int):
-        if tile == "s":
-            self.tank_spawns.append((x * 32, y * 32))
+        for y in range(wall.box.top // 32, wall.box.bottom // 32):
+            for x in range(wall.box.left // 32, wall.box.right // 32):
+                self.wall_colliders[(x, y)] = wall
 
-    def game_loop(self):
-        while self.running:
-            self.clock.tick(store.FPS)
+    def damage_walls(self, area: pg.Rect, amount: int):
+        """Damage all wall tiles touching the area and update only the colliders that broke."""
 
-            # Logic
-            for entity in self.entities:
-                entity.update()
+        if not store.DESTRUCTIBLE_WALLS:
+            return
+
+        for y in range(area.top // 32, (area.bottom - 1) // 32 + 1):
+            for x in range(area.left // 32, (area.right - 1) // 32 + 1):
+                self.damage_wall(x, y, amount)
+
+    def damage_wall(self, x: int, y: int, amount: int) -> bool:
+        """Damage one wall tile. Returns True if it broke and its collider was updated."""
+
+        if (x, y) not in self.wall_colliders or not self.map_handler.damage_wall(x, y, amount):
+            return False
 
-            # Draw
-            self.screen.fill(store.BLACK)
+        self.split_wall(self.wall_colliders[(x, y)])
+        self.update_map_area(self.map_handler.tile_area(x, y))
+        return True
 
-            self.screen.blit(self.map_img, (0, 0))
+    def split_wall(self, wall: "Entity"):
+        """Replace a wall collider by merged colliders of its remaining wall tiles."""
 
+        self.entities.remove(wall)
+        left, top = wall.box.left // 32, wall.box.top // 32
+        for y in range(top, wall.box.bottom // 32):
+            for x in range(left, wall.box.right // 32):
+                del self.wall_colliders[(x, y)]
+
+        tiles = [
+            row[left : wall.box.right // 32]
+            for row in self.map_handler.tile_map[top : wall.box.bottom // 32]
+        ]
+        for x, y, width, height in merge_walls(tiles):
+            self.place_wall(((left + x) * 32, (top + y) * 32, width * 32, height * 32))
+
+    def set_render_scale(self, scale: float):
+        """Recreate the offscreen surface, map image and effects at a new render scale."""
+
+        self.scale = scale
+        size = (round(self.SIZE[0] * scale), round(self.SIZE[1] * scale))
+        self.screen = pg.Surface(size)
+
+        if scale == 1:
+            self.map_img = self.map_handler.get_map()
+        else:
+            self.map_img = pg.transform.smoothscale(self.map_handler.get_map(), size)
+        self.effects.set_scale(scale)
+        if self.fog:
+            self.fog.resize()
+
+    def update_map_area(self, area: pg.Rect):
+        # At scale 1 the map image is the baked map itself and already up to date
+        if self.scale == 1:
+            return
+
+        scaled_area = self.to_screen_rect(area)
+        map_area = self.map_handler.get_map().subsurface(area)
+        self.map_img.blit(pg.transform.smoothscale(map_area, scaled_area.size), scaled_area)
+
+    def to_screen(self, pos: tuple[float, float]) -> tuple[int, int]:
+        """Convert game coordinates to coordinates on the scaled screen."""
+        return round(pos[0] * self.scale), round(pos[1] * self.scale)
+
+    def to_screen_rect(self, rect: pg.Rect) -> pg.Rect:
+        left, top = int(rect.left * self.scale), int(rect.top * self.scale)
+        right, bottom = ceil(rect.right * self.scale), ceil(rect.bottom * self.scale)
+        return pg.Rect(left, top, right - left, bottom - top)
+
+    def scaled(self, surface: pg.Surface) -> pg.Surface:
+        """A surface scaled to the render scale, cached."""
+        return surface if self.scale == 1 else _scale_surface_by(surface, self.scale)
+
+    def update(self):
+        self.clock.tick(store.FPS)
+        if store.ADAPTIVE_QUALITY and self.governor.record(self.clock.get_rawtime()):
+            self.apply_quality()
+
+        self.step()
+        if not self.running:
+            self.manager.pop()
+
+    def handle_event(self, event: pg.event.Event):
+        if event.type == pg.QUIT:
+            self.manager.pop()
+        elif event.type in (pg.JOYDEVICEADDED, pg.JOYDEVICEREMOVED) and self.controls:
+            self.controls.refresh_joysticks()
+        elif event.type == pg.KEYDOWN and event.key == pg.K_r and self.end_animation_frame > 100:
+            self.rematch = True
+            self.manager.pop()
+
+    def close(self):
+        self.running = False
+        if self.capture:
+            self.capture.close()
+
+    def step(self):
+        """Advance the simulation by one tick."""
+
+        self.frame += 1
+
+        # Input
+        if self.controls:
+            self.controls.sample()
+        for tank in self.tanks:
+            tank.action = tank.input()
+        self.actions.extend([tank.action for tank in self.tanks])
+
+        # Logic. Shells and broken walls change the entities while they update.
+        for entity in list(self.entities):
+            entity.update()
+        self.effects.update()
+        if self.fog:
+            self.fog.update()
+        if store.DETERMINISTIC:
+            self.checksums.append(self.checksum())
+        self.spectators.publish(self)
+
+        if store.TELEMETRY and self.frame % store.TELEMETRY_SAMPLE_RATE == 0:
+            for tank in self.tanks:
+                self.record("position", tank.id, tank.box.centerx, tank.box.centery)
+
+        # End animation
+        if self.end_animation_frame > 0:
+            self.end_animation_frame += 1
+        if self.end_animation_frame > 400:
+            self.running = False
+
+    def get_bullets(self) -> list["Bullet"]:
+        return [entity for entity in self.entities if isinstance(entity, Bullet)]
+
+    def checksum(self) -> int:
+        """
+        A CRC of the simulation state, cheap enough to take every tick. Compare them
+        to find the first tick a replay or another machine in lockstep disagrees on.
+        """
+
+        state = array("q", (self.frame, self.map_handler.version, len(self.entities)))
+        for entity in self.entities:
+            state.extend(entity.get_state())
+        return zlib.crc32(state)
+
+    def draw(self):
+        self.screen.fill(store.BLACK)
+
+        # The fog of war is baked into its own copy of the map image
+        self.screen.blit(self.fog.image if self.fog else self.map_img, (0, 0))
+
+        for entity in self.entities:
+            entity.draw()
+        self.render_queue.flush(self.screen)
+        self.effects.draw(self.screen)
+
+        if store.DEBUG:
             for entity in self.entities:
-                entity.draw()
-
-            # End animation
-            if self.end_animation_frame > 0:
-                self.end_animation_frame += 1
-            if self.end_animation_frame > 100:
-                text = store.generate_text("Game Over", font=store.BIG_FONT)
-                draw_pos = (
-                    (self.SIZE[0] / 2) - text.get_width() / 2,
-                    (self.SIZE[1] / 2) - text.get_height() / 2,
-                )
-                self.screen.blit(text, draw_pos)
-            if self.end_animation_frame > 400:
-                self.running = False
+                entity.draw_debug()
 
-            # Quit
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.running = False
+        if self.end_animation_frame > 100:
+            text = store.generate_text("Game Over", font=store.BIG_FONT, scale=self.scale)
+            draw_pos = (
+                (self.screen.get_width() / 2) - text.get_width() / 2,
+                (self.screen.get_height() / 2) - text.get_height() / 2,
+            )
+            self.screen.blit(text, draw_pos)
+
+            hint = store.generate_text("R: Rematch", font=store.SMALL_FONT, scale=self.scale)
+            self.screen.blit(
+                hint,
+                (self.screen.get_width() / 2 - hint.get_width() / 2, draw_pos[1] + text.get_height()),
+            )
+
+        # Draw FPS
+        fps = str(int(round(self.clock.get_fps(), 0)))
+        if store.DEBUG:
+            fps += f" Quality: {self.quality.name}"
+        text = store.generate_text(fps, scale=self.scale)
+        self.screen.blit(text, (5, 5))
+
+        if store.DEBUG:
+            self.draw_memory(text.get_height() + 10)
+
+        if self.capture:
+            self.capture.grab(self.screen)
+
+    def draw_memory(self, y: int):
+        # Collecting the report walks all caches, so only do it once a second
+        if self.frame % store.FPS == 1 or not self.memory_text:
+            report = memory.collect_report()
+            memory.check_budget(report)
+            self.memory_text = [
+                store.generate_text(line, font=store.SMALL_FONT, scale=self.scale)
+                for line in memory.format_report(report, short=True)
+            ]
+
+        for text in self.memory_text:
+            self.screen.blit(text, (5, y))
+            y += text.get_height()
+
+    def is_hidden(self, entity: "Entity") -> bool:
+        """Whether the fog of war hides an entity of another team."""
+        return (
+            self.fog is not None
+            and entity.team != self.fog.team
+            and not self.fog.is_visible(entity.box.center)
+        )
+
+    def get_time(self) -> float:
+        """Simulation time in ms, independent of how fast the ticks actually run."""
+        return self.frame * 1000 / store.FPS
+
+    def apply_quality(self):
+        self.quality = self.governor.level
+        self.effects.particles = self.quality.particles
+        self.effects.frame_step = self.quality.frame_step
 
-            # Draw FPS
-            fps = str(int(round(self.clock.get_fps(), 0)))
-            text = store.generate_text(fps)
-            self.screen.blit(text, (5, 5))
+        # A recording keeps the size it started with
+        scale = store.RENDER_SCALE * self.quality.render_scale
+        if scale != self.scale and not self.capture:
+            self.set_render_scale(scale)
 
-            pg.display.flip()
+    def record(self, kind: str, *values):
+        """Push a telemetry event, see `telemetry.EVENT_FIELDS`."""
+        self.telemetry.push((kind, self.match_id, self.frame, *values))
 
     def end(self):
+        if self.end_animation_frame == 0:
+            winners = {tank.team for tank in self.tanks if not tank.is_destroyed}
+            self.record("match_end", winners.pop() if len(winners) == 1 else None)
+
         self.end_animation_frame += 1
 
 
@@ -238,12 +668,86 @@ class Entity:
         if size:
             self.box = pg.Rect((*pos[:2], *size))
 
+        # Collision mask, see `get_mask`
+        self.mask_key: tuple | None = None
+        self.mask: pg.mask.Mask | None = None
+        self.mask_rect: pg.Rect | None = None
+
     def update(self):
         pass
 
+    def get_state(self) -> tuple[int, ...]:
+        """The state that changes during a match, as ints for `Game.checksum`."""
+        return ()
+
+    def get_mask_angle(self) -> int | None:
+        """The angle of the rotated sprite to collide with, or None to collide with the box."""
+        return None
+
+    def get_mask(self) -> tuple[pg.mask.Mask, pg.Rect]:
+        """
+        The collision mask and the rect it covers in game coordinates. Only looked up
+        again after the entity moved or turned.
+        """
+
+        angle = self.get_mask_angle()
+        key = (self.box.x, self.box.y, angle, self.image)
+        if key != self.mask_key:
+            self.mask_key = key
+            if angle is None:
+                self.mask = _box_mask(self.box.size)
+                self.mask_rect = self.box.copy()
+            else:
+                self.mask = _sprite_mask(self.image, _quantise(angle, store.MASK_ANGLE_STEP))
+                self.mask_rect = self.mask.get_rect(center=self.box.center)
+
+        return self.mask, self.mask_rect
+
+    def get_bounds(self) -> pg.Rect:
+        """
+        A rect around everything the entity can collide with. The rotated sprite can reach
+        outside the box, but never further from its center than half its diagonal.
+        """
+
+        if self.get_mask_angle() is None:
+            return self.box
+
+        side = ceil(hypot(*self.image.get_size()))
+        return pg.Rect(0, 0, side, side).move(
+            self.box.centerx - side // 2, self.box.centery - side // 2
+        ).union(self.box)
+
+    def find_collision(self, entities: Iterable["Entity"]) -> "Entity | None":
+        """The first of the entities this entity collides with."""
+
+        if not _pixel_collision():
+            for entity in entities:
+                if self.box.colliderect(entity.box):
+                    return entity
+            return None
+
+        # Cheap bounds test first, masks only for the few entities that are close
+        bounds = self.get_bounds()
+        mask = None
+        for entity in entities:
+            if not bounds.colliderect(entity.get_bounds()):
+                continue
+
+            if mask is None:
+                mask, rect = self.get_mask()
+            other_mask, other_rect = entity.get_mask()
+            if mask.overlap(other_mask, (other_rect.x - rect.x, other_rect.y - rect.y)):
+                return entity
+
+        return None
+
     def draw(self):
         if self.image:
-            self.game.screen.blit(self.image, self.box)
+            image = self.game.scaled(self.image)
+            self.game.render_queue.submit(BODIES, image, self.game.to_screen(self.box.topleft))
+
+    def draw_debug(self):
+        pass
 
 
 class Tank(Entity):
@@ -252,50 +756,56 @@ class Tank(Entity):
         game: Game,
         pos: tuple[float, float],
         tank_type_path: str,
-        keys: dict[str, int],
         team: str,
         color: int,
+        input: Callable[[], int],
     ):
 
         # Load the tank type from a file
-        self.stats = get_tanks_stats(tank_type_path)
+        self.type_path = tank_type_path
+        self.stats = get_tank_type(tank_type_path)
         self.current_ammo = self.stats.max_shells
         self.reload_cooldown = self.stats.reload_speed
-        self.stats.color = color
+        self.color = color
 
-        self.image = pg.transform.scale_by(
-            store.ASSETS[
-                f"/images/proprietary/tank/Tanks_base/tank{self.stats.image_type}_color{self.stats.color}.png"
-            ],
-            self.stats.body_scale,
-        )
-        self.turret_image = pg.transform.scale_by(
-            store.ASSETS[
-                f"/images/proprietary/tank/Cannons_color{self.stats.color}/cannon{self.stats.image_type}_1.png"
-            ],
-            self.stats.turret_scale,
-        )
+        self.sprites = get_tank_sprites(tank_type_path, color)
+        self.image = self.sprites.body
+        self.turret_image = self.sprites.turret
         super().__init__(game, pos, team, self.image)
 
+        self.id = 0
         self.velocity = [0, 0]
         self.draw_angle = 0
         self.last_shot = 0
+        # Frames for telemetry
+        self.first_hit_frame: int | None = None
+        self.out_of_ammo_frame = 0
         self.turret_angle = 0
         self.is_destroyed = False
-        self.is_exploding = False
-        self.animation_frame = 0
-        self.shots = [store.ASSETS[f"/sounds/shot/{i}.wav"] for i in range(1)]
 
-        self.keys = keys
+        self.input = input
+        # The action bitmask of the current tick, sampled by the game
+        self.action = 0
 
         self.health = self.stats.health
-        self.turret_angle_speed = self.stats.turret_speed
+
+        # Velocities are in fixed point in deterministic mode, see `tanks.fixed`. The
+        # turret speed is rounded to it too, so adding it to the angle is exact.
+        if store.DETERMINISTIC:
+            self.acceleration = fixed.to_fixed(self.stats.acceleration)
+            self.max_speed = fixed.to_fixed(self.stats.max_speed)
+            self.drift = fixed.to_fixed(self.stats.drift)
+            self.min_speed = fixed.to_fixed(0.1)
+            self.turret_speed = fixed.to_float(fixed.to_fixed(self.stats.turret_speed))
+        else:
+            self.acceleration = self.stats.acceleration
+            self.max_speed = self.stats.max_speed
+            self.drift = self.stats.drift
+            self.min_speed = 0.1
+            self.turret_speed = self.stats.turret_speed
+        self.turret_angle_speed = self.turret_speed
 
     def update(self):
-        if self.is_exploding:
-            self.animation_frame += 0.1
-            if self.animation_frame > 8:
-                self.is_exploding = False
         if self.is_destroyed:
             return
 
@@ -305,114 +815,121 @@ class Tank(Entity):
 
             if self.reload_cooldown == 0:
                 self.reload_cooldown = self.stats.reload_speed
+                if self.current_ammo == 0:
+                    self.game.record("starved", self.id, self.game.frame - self.out_of_ammo_frame)
                 self.current_ammo += 1
 
-        # Keyboard input
-        keys = pg.key.get_pressed()
+        action = self.action
 
         # Turret Rotation
         if store.MANUAL_TURRET:
-            if keys[self.keys["turret_left"]]:
-                self.turret_angle += self.stats.turret_speed
-            if keys[self.keys["turret_right"]]:
-                self.turret_angle -= self.stats.turret_speed
+            if action & TURRET_LEFT:
+                self.turret_angle += self.turret_speed
+            if action & TURRET_RIGHT:
+                self.turret_angle -= self.turret_speed
         else:
             self.turret_angle += self.turret_angle_speed
 
         # Reduce velocity, aka drift
-        if not (keys[self.keys["up"]] or keys[self.keys["down"]]):
-            self.velocity[1] *= self.stats.drift
-            self.velocity[1] = 0 if abs(self.velocity[1]) < 0.1 else self.velocity[1]
-        if not (keys[self.keys["left"]] or keys[self.keys["right"]]):
-            self.velocity[0] *= self.stats.drift
-            self.velocity[0] = 0 if abs(self.velocity[0]) < 0.1 else self.velocity[0]
+        if not action & (UP | DOWN):
+            self.velocity[1] = self.slow_down(self.velocity[1])
+        if not action & (LEFT | RIGHT):
+            self.velocity[0] = self.slow_down(self.velocity[0])
 
         # Movement
-        if keys[self.keys["up"]]:
+        if action & UP:
             self.velocity[1] = _limit(
-                self.velocity[1] - self.stats.acceleration,
-                -self.stats.max_speed,
-                self.stats.max_speed,
+                self.velocity[1] - self.acceleration,
+                -self.max_speed,
+                self.max_speed,
             )
-        if keys[self.keys["down"]]:
+        if action & DOWN:
             self.velocity[1] = _limit(
-                self.velocity[1] + self.stats.acceleration,
-                -self.stats.max_speed,
-                self.stats.max_speed,
+                self.velocity[1] + self.acceleration,
+                -self.max_speed,
+                self.max_speed,
             )
-        if keys[self.keys["left"]]:
+        if action & LEFT:
             self.velocity[0] = _limit(
-                self.velocity[0] - self.stats.acceleration,
-                -self.stats.max_speed,
-                self.stats.max_speed,
+                self.velocity[0] - self.acceleration,
+                -self.max_speed,
+                self.max_speed,
             )
-        if keys[self.keys["right"]]:
+        if action & RIGHT:
             self.velocity[0] = _limit(
-                self.velocity[0] + self.stats.acceleration,
-                -self.stats.max_speed,
-                self.stats.max_speed,
+                self.velocity[0] + self.acceleration,
+                -self.max_speed,
+                self.max_speed,
             )
 
         # Actual movement
         any_key_pressed = False
-        if not (
-            keys[self.keys["up"]]
-            or keys[self.keys["down"]]
-            or keys[self.keys["left"]]
-            or keys[self.keys["right"]]
-        ):
+        if not action & (UP | DOWN | LEFT | RIGHT):
             any_key_pressed = True
-        self.box.y += self.velocity[1]
+        step = self.to_pixels(self.velocity[1])
+        self.box.y += step
         if self.check_collision():
-            self.box.y -= self.velocity[1]
+            self.box.y -= step
             if store.BOUNCE:
                 self.velocity[1] *= -1
             if any_key_pressed:
                 self.velocity[1] = 0
-        self.box.x += self.velocity[0]
+        step = self.to_pixels(self.velocity[0])
+        self.box.x += step
         if self.check_collision():
-            self.box.x -= self.velocity[0]
+            self.box.x -= step
             if store.BOUNCE:
                 self.velocity[0] *= -1
             if any_key_pressed:
                 self.velocity[0] = 0
 
-        if keys[self.keys["shoot"]]:
-            if pg.time.get_ticks() - self.last_shot > self.stats.cooldown:
-                self.last_shot = pg.time.get_ticks()
+        self.turn()
+
+        if action & SHOOT:
+            if self.game.get_time() - self.last_shot > self.stats.cooldown:
+                self.last_shot = self.game.get_time()
                 self.shoot()
 
+    def slow_down(self, speed: float) -> float:
+        if store.DETERMINISTIC:
+            speed = fixed.mul(speed, self.drift)
+        else:
+            speed *= self.drift
+        return 0 if abs(speed) < self.min_speed else speed
+
+    def to_pixels(self, speed: float) -> float:
+        # In float mode the box rounds the position itself
+        return fixed.to_pixels(speed) if store.DETERMINISTIC else speed
+
+    def get_velocity(self) -> tuple[float, float]:
+        """The velocity in pixels per tick in both modes."""
+        if store.DETERMINISTIC:
+            return fixed.to_float(self.velocity[0]), fixed.to_float(self.velocity[1])
+        return self.velocity[0], self.velocity[1]
+
+    def get_state(self) -> tuple[int, ...]:
+        return (
+            self.box.x,
+            self.box.y,
+            *(fixed.to_fixed(speed) for speed in self.get_velocity()),
+            fixed.to_fixed(self.turret_angle),
+            fixed.to_fixed(self.turret_angle_speed),
+            self.draw_angle,
+            self.health,
+            self.current_ammo,
+            fixed.to_fixed(self.reload_cooldown),
+            fixed.to_fixed(self.last_shot),
+        )
+
     def check_collision(self) -> bool:
-        for entity in filter(lambda e: e.collision, self.game.entities):
-            if entity != self and self.box.colliderect(entity.box):
-                return True
+        entities = (e for e in self.game.entities if e.collision and e is not self)
+        return self.find_collision(entities) is not None
 
-        return False
+    def turn(self):
+        """Point the tank in the direction it moves."""
 
-    def shoot(self):
-        if self.current_ammo == 0:
-            return
-        self.current_ammo -= 1
-        self.reload_cooldown = self.stats.reload_speed * 1.5
+        previous_angle = self.draw_angle
 
-        choice(self.shots).play()
-        self.turret_angle_speed *= -1
-        pos = (
-            self.box.center[0] + sin(radians(self.turret_angle)) * 50,
-            self.box.center[1] + cos(radians(self.turret_angle)) * 50,
-        )
-        self.game.entities.append(
-            Bullet(
-                self.game,
-                pos,
-                self.turret_angle,
-                self.stats.bullet_speed,
-                self.stats.bullet_damage,
-                self.team,
-            )
-        )
-
-    def draw(self):
         # diagonal directions
         if self.velocity[0] > 0 > self.velocity[1]:
             self.draw_angle = 135
@@ -432,7 +949,56 @@ class Tank(Entity):
         elif self.velocity[0] > 0:
             self.draw_angle = 90
 
-        tank_img, tank_img_pos = _rot_center(self.image, self.draw_angle, self.box.center)
+        # With pixel collision the rotated sprite must not turn into a wall
+        if _pixel_collision() and self.draw_angle != previous_angle and self.check_collision():
+            self.draw_angle = previous_angle
+
+    def get_mask_angle(self) -> int | None:
+        return self.draw_angle
+
+    def shoot(self):
+        if self.current_ammo == 0:
+            return
+        self.current_ammo -= 1
+        self.reload_cooldown = self.stats.reload_speed * 1.5
+        if self.current_ammo == 0:
+            self.out_of_ammo_frame = self.game.frame
+        self.game.record("shot", self.id)
+
+        self.game.audio.play("shot")
+        self.turret_angle_speed *= -1
+        if store.DETERMINISTIC:
+            # Whole degrees for the lookup tables
+            angle = round(self.turret_angle) % 360
+            pos = (
+                self.box.center[0] + fixed.to_pixels(fixed.fsin(angle) * 50),
+                self.box.center[1] + fixed.to_pixels(fixed.fcos(angle) * 50),
+            )
+        else:
+            angle = self.turret_angle
+            pos = (
+                self.box.center[0] + sin(radians(self.turret_angle)) * 50,
+                self.box.center[1] + cos(radians(self.turret_angle)) * 50,
+            )
+        self.game.entities.append(
+            Bullet(
+                self.game,
+                pos,
+                angle,
+                self.stats.bullet_speed,
+                self.stats.bullet_damage,
+                self.team,
+                self,
+            )
+        )
+
+    def draw(self):
+        if self.game.is_hidden(self):
+            return
+
+        tank_img, tank_img_pos = _rot_center(
+            self.game.scaled(self.image), self.draw_angle, self.game.to_screen(self.box.center)
+        )
 
         # Rotate the turret correctly
         # https://matthew-brett.github.io/teaching/rotation_2d.html
@@ -447,27 +1013,35 @@ class Tank(Entity):
             sin(radians(vector_angle)) * turret_pos_vector[0]
             + cos(radians(vector_angle)) * turret_pos_vector[1],
         )
-        turret_pos = (
+        turret_pos = self.game.to_screen((
             self.box.center[0] + rotated_turret_offset_vector[0],
             self.box.center[1] + rotated_turret_offset_vector[1],
-        )
+        ))
+        turret_angle = _quantise(self.turret_angle, self.game.quality.rotation_step)
         turret_image, turret_image_pos = _rot_center(
-            self.turret_image, self.turret_angle, turret_pos
+            self.game.scaled(self.turret_image), turret_angle, turret_pos
         )
 
         # Draw the tank and turret
-        self.game.screen.blit(tank_img, tank_img_pos)
-        self.game.screen.blit(turret_image, turret_image_pos)
+        self.game.render_queue.submit(BODIES, tank_img, tank_img_pos)
+        self.game.render_queue.submit(TURRETS, turret_image, turret_image_pos)
+
+        show_bars = (
+            self.game.quality.all_bars
+            or self.health < self.stats.health
+            or self.current_ammo < self.stats.max_shells
+        )
+        if not self.is_destroyed and show_bars:
+            scale = self.game.scale
+            left, bottom = self.game.to_screen(self.box.bottomleft)
 
-        if not self.is_destroyed:
             # Show health
             health_percent = (self.health * 100) / self.stats.health
-            start = (self.box.bottomleft[0], self.box.bottomleft[1] + 20)
-            end = (
-                self.box.bottomleft[0] + health_percent / 2,
-                self.box.bottomleft[1] + 20,
+            start = (0, 20 * scale)
+            end = (health_percent / 2 * scale, 20 * scale)
+            self.game.render_queue.submit_bar(
+                ((store.RED, start, end, max(1, round(5 * scale))),), (left, bottom)
             )
-            pg.draw.line(self.game.screen, store.RED, start, end, 5)
 
             # Show ammo. If above 10, show percentage
             if self.stats.max_shells > 10:
@@ -475,65 +1049,57 @@ class Tank(Entity):
             else:
                 ammo_draw_count = self.current_ammo
 
+            # All shells are one cached strip instead of two lines per shell
+            width = max(1, round(3 * scale))
+            lines = []
             for i in range(ammo_draw_count):
-                x = self.box.bottomleft[0] + i * 5
-                pg.draw.line(
-                    self.game.screen,
-                    store.GOLDENROD,
-                    (x, self.box.bottomleft[1] + 30),
-                    (x, self.box.bottomleft[1] + 42),
-                    3,
-                )
-                pg.draw.line(
-                    self.game.screen,
-                    store.DARK_GOLDENROD,
-                    (x, self.box.bottomleft[1] + 30),
-                    (x, self.box.bottomleft[1] + 33),
-                    3,
-                )
-
-        # Explosion animation
-        if self.is_exploding:
-            raw_explosion_img = _scale_surface_by(
-                store.ASSETS[f"/images/proprietary/explosion/{int(self.animation_frame)}.png"], 2.5
+                x = i * 5 * scale
+                lines.append((store.GOLDENROD, (x, 30 * scale), (x, 42 * scale), width))
+                lines.append((store.DARK_GOLDENROD, (x, 30 * scale), (x, 33 * scale), width))
+            if lines:
+                self.game.render_queue.submit_bar(tuple(lines), (left, bottom))
+
+    def draw_debug(self):
+        pg.draw.rect(self.game.screen, store.RED, self.game.to_screen_rect(self.box), 1)
+
+        debug_stats: dict[str, any] = {
+            "He": self.health,
+            "An": self.draw_angle,
+            "Ve": self.get_velocity(),
+            "Am": self.current_ammo,
+        }
+        draw_x, draw_pos = self.game.to_screen(self.box.topleft)
+        for description, stat in debug_stats.items():
+            text = store.generate_text(
+                f"{description}: {stat}", font=store.SMALL_FONT, scale=self.game.scale
             )
-            explosion_img, explosion_img_pos = _rot_center(raw_explosion_img, 0, self.box.center)
-            self.game.screen.blit(explosion_img, explosion_img_pos)
+            self.game.screen.blit(text, (draw_x, draw_pos))
+            draw_pos += round(20 * self.game.scale)
 
-        # Debug
-        if store.DEBUG:
-            pg.draw.rect(self.game.screen, store.RED, self.box, 1)
-
-            debug_stats: dict[str, any] = {
-                "He": self.health,
-                "An": self.draw_angle,
-                "Ve": self.velocity,
-                "Am": self.current_ammo,
-            }
-            draw_pos = self.box.y
-            for description, stat in debug_stats.items():
-                store.SMALL_FONT.render_to(
-                    self.game.screen,
-                    (self.box.x, draw_pos),
-                    f"{description}: {stat}",
-                    store.WHITE,
-                )
-                draw_pos += 20
+    def damage(self, amount, shooter: "Tank | None" = None):
+        if shooter:
+            self.game.record("hit", shooter.id, self.id, amount, shooter.stats.name)
+        if self.first_hit_frame is None:
+            self.first_hit_frame = self.game.frame
 
-    def damage(self, amount):
         self.health -= amount
         if self.health <= 0:
             self.death()
 
     def death(self):
-        self.is_exploding = True
         self.is_destroyed = True
-        self.image = store.ASSETS[
-            f"/images/proprietary/tank/Broken_assets/tank{self.stats.image_type}_color1_broken.png"
-        ]
-        self.turret_image = store.ASSETS[
-            f"/images/proprietary/tank/Broken_assets/cannon{self.stats.image_type}_1_broken.png"
-        ]
+        time_to_kill = (self.game.frame - self.first_hit_frame) * 1000 / store.FPS
+        self.game.record("death", self.id, time_to_kill)
+        self.game.audio.play("explosion")
+
+        effects = self.game.effects
+        effects.spawn("big_explosion", self.box.center)
+        effects.burst("debris", self.box.center, 16, 5)
+        effects.burst("smoke", self.box.center, 10, 1)
+        effects.burst("spark", self.box.center, 24, 7)
+
+        self.image = self.sprites.broken_body
+        self.turret_image = self.sprites.broken_turret
         self.game.end()
 
 
@@ -546,76 +1112,79 @@ class Bullet(Entity):
         speed: int,
         damage: int,
         team: str,
+        shooter: Tank | None = None,
     ):
         image = _scale_surface(store.ASSETS["/images/shell.png"], (20, 20))
         super().__init__(game, pos, team, image, collision=False, size=(20, 20))
         self.angle = angle
-        self.animation_frame = 0
-        self.is_exploding = False
+        self.shooter = shooter
 
         self.speed = speed
         self.damage = damage
 
+        # Whole pixels per tick in deterministic mode, where the angle is in whole degrees
+        self.step: tuple[int, int] | None = None
+        if store.DETERMINISTIC:
+            speed = fixed.to_fixed(speed)
+            self.step = (
+                fixed.to_pixels(fixed.mul(fixed.fsin(angle), speed)),
+                fixed.to_pixels(fixed.mul(fixed.fcos(angle), speed)),
+            )
+
     def update(self):
-        if self.is_exploding:
-            self.animation_frame += 0.5
-            if self.animation_frame > 8:
-                self.game.entities.remove(self)
-                del self
+        entities = (e for e in self.game.entities if e.collision and e.team != self.team)
+        entity = self.find_collision(entities)
+        if entity:
+            self.explode()
+            if isinstance(entity, Tank) and entity.health > 0:
+                entity.damage(self.damage, self.shooter)
+            elif entity.team == "block":
+                area = self.get_mask()[1] if _pixel_collision() else self.box
+                self.game.damage_walls(area.clip(entity.box), self.damage)
             return
 
-        for entity in filter(lambda e: e.collision and e.team != self.team, self.game.entities):
-            if self.box.colliderect(entity.box):
-                self.is_exploding = True
-                if isinstance(entity, Tank) and entity.health > 0:
-                    entity.damage(self.damage)
-                return
+        if self.step:
+            self.box.move_ip(self.step)
+        else:
+            self.box.x += sin(radians(self.angle)) * self.speed
+            self.box.y += cos(radians(self.angle)) * self.speed
+
+    def get_state(self) -> tuple[int, ...]:
+        return self.box.x, self.box.y, fixed.to_fixed(self.angle)
 
-        self.box.x += sin(radians(self.angle)) * self.speed
-        self.box.y += cos(radians(self.angle)) * self.speed
+    def get_mask_angle(self) -> int | None:
+        return self.angle if _pixel_collision() else None
+
+    def explode(self):
+        self.game.effects.spawn("explosion", self.box.center)
+        self.game.effects.burst("spark", self.box.center, 6, 4)
+        self.game.entities.remove(self)
 
     def draw(self):
-        if self.is_exploding:
-            self.image = store.ASSETS[f"/images/proprietary/explosion/{int(self.animation_frame)}.png"]
-            self.game.screen.blit(self.image, (self.box.x - 48, self.box.y - 48))
+        if self.game.is_hidden(self):
             return
 
-        image, rect = _rot_center(self.image, self.angle, self.box.center)
-        self.game.screen.blit(image, rect)
+        image, rect = _rot_center(
+            self.game.scaled(self.image),
+            _quantise(self.angle, self.game.quality.rotation_step),
+            self.game.to_screen(self.box.center),
+        )
+        self.game.render_queue.submit(SHELLS, image, rect)
 
-        if store.DEBUG:
-            pg.draw.rect(self.game.screen, store.RED, self.box, 1)
+    def draw_debug(self):
+        pg.draw.rect(self.game.screen, store.RED, self.game.to_screen_rect(self.box), 1)
 
 
 if __name__ == "__main__":
+    from tanks.scenes import SceneManager
+
     g = Game(
         "/maps/gras1.txt",
         [
-            {
-                "type": "/types/speedy.json",
-                "keys": {
-                    "up": pg.K_w,
-                    "down": pg.K_s,
-                    "left": pg.K_a,
-                    "right": pg.K_d,
-                    "shoot": pg.K_SPACE,
-                    "turret_right": pg.K_x,
-                    "turret_left": pg.K_y,
-                },
-                "color": 1,
-            },
-            {
-                "type": "/types/minigun.json",
-                "keys": {
-                    "up": pg.K_UP,
-                    "down": pg.K_DOWN,
-                    "left": pg.K_LEFT,
-                    "right": pg.K_RIGHT,
-                    "shoot": pg.K_RETURN,
-                    "turret_right": pg.K_MINUS,
-                    "turret_left": pg.K_PERIOD,
-                },
-                "color": 2,
-            },
+            {"type": "/types/speedy.json", "player": 0, "color": 1},
+            {"type": "/types/minigun.json", "player": 1, "color": 2},
         ],
     )
+    manager = SceneManager(_fit_window(g.SIZE))
+    manager.push(g)
+    manager.run()
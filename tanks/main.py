@@ -2,11 +2,14 @@ from random import randint
 from typing import Callable
 
 import pygame as pg
-from PIL import ImageFilter, Image
 
 import tanks.store as store
 from tanks.credits import Credits
-from tanks.game import Game, get_tanks_stats, _rot_center, Map
+from tanks.game import Game, _fit_window, _rot_center
+from tanks.map_compiler import TILE_SIZE, compile_map
+from tanks.prewarm import MATCH_PREPARED, MatchKey, Prewarmer
+from tanks.scenes import Scene, SceneManager
+from tanks.tank_types import get_tank_type, get_tank_types, get_tank_sprites
 
 
 class TextButton:
@@ -40,14 +43,14 @@ class Button:
             self.on_click()
 
 
-class Window:
+class Menu(Scene):
+    SIZE = (1040, 520)
+    caption = "Map Selection"
+
     def __init__(self):
-        self.SIZE = (1040, 520)
+        super().__init__()
         self.FONT_SIZE = 30
-
-        # Main window
-        self.screen = pg.display.set_mode(self.SIZE)
-        pg.display.set_caption("Map Selection")
+        self.screen = pg.Surface(self.SIZE)
 
         # Tank attributes
         self.tank1image = None
@@ -55,7 +58,7 @@ class Window:
         self.tank_1_color = 1
         self.tank_2_index = 1
         self.tank_2_color = 2
-        self.tank_paths = [name for name in store.ASSETS if "types" in name]
+        self.tank_paths = list(get_tank_types())
         self.gui_tank_stats = [self.get_tank_stats_from_index(self.tank_1_index), self.get_tank_stats_from_index(self.tank_2_index)]
         self.stats = ["Name: ", "Health: ", "Speed: ", "Damage: ", "Ammo: "]
         self.tank_stats_list = []
@@ -64,7 +67,10 @@ class Window:
         self.map_index = 0
         self.map_paths = [file_name for file_name in store.ASSETS if "maps" in file_name]
         self.map_image = None
-        self.set_map_image()
+
+        # Prepare the selected match in the background, so starting it is instant
+        self.prewarmer = Prewarmer(self.SIZE)
+        self.prewarmer.request(self.get_match())
 
         # Buttons
         self.buttons: list[Button | TextButton] = []
@@ -72,10 +78,8 @@ class Window:
         self.BUTTON_WIDTH = self.SIZE[0] // 10
         self.add_buttons()
 
-        self.loop()
-
     def get_display_tank_stats(self, tank: str) -> list[str]:
-        stats = get_tanks_stats(tank)
+        stats = get_tank_type(tank)
         name = str(stats.name)
         health = str(stats.health)
         speed = str(stats.max_speed)
@@ -85,8 +89,7 @@ class Window:
         return [name, health, speed, damage, ammo]
 
     def show_credits(self):
-        Credits()
-        self.after_subscreen_closed()
+        self.manager.push(Credits())
 
     def get_tank_stats_from_index(self, i: int) -> list[str]:
         tank_path = self.tank_paths[i]
@@ -239,112 +242,98 @@ class Window:
     def get_random_tank_color(self) -> int:
         return randint(1, 5)
 
-    def start_game(self):
-        Game(
+    def get_match(self) -> MatchKey:
+        return (
             self.map_paths[self.map_index],
-            [
-                {
-                    "type": self.tank_paths[self.tank_1_index],
-                    "keys": {
-                        "up": pg.K_w,
-                        "down": pg.K_s,
-                        "left": pg.K_a,
-                        "right": pg.K_d,
-                        "shoot": pg.K_SPACE,
-                    },
-                    "color": self.tank_1_color,
-                },
-                {
-                    "type": self.tank_paths[self.tank_2_index],
-                    "keys": {
-                        "up": pg.K_UP,
-                        "down": pg.K_DOWN,
-                        "left": pg.K_LEFT,
-                        "right": pg.K_RIGHT,
-                        "shoot": pg.K_RETURN,
-                    },
-                    "color": self.tank_2_color,
-                },
-            ],
+            (
+                (self.tank_paths[self.tank_1_index], self.tank_1_color),
+                (self.tank_paths[self.tank_2_index], self.tank_2_color),
+            ),
         )
-        self.after_subscreen_closed()
 
-    def after_subscreen_closed(self):
-        self.screen = pg.display.set_mode(self.SIZE)
+    def start_game(self):
+        match = self.get_match()
+        map_path, tanks = match
+        self.manager.push(
+            Game(
+                map_path,
+                [
+                    {"type": tank_type, "player": i, "color": color}
+                    for i, (tank_type, color) in enumerate(tanks)
+                ],
+                game_map=self.prewarmer.take(match),
+            )
+        )
 
-    def loop(self):
-        running = True
-        while running:
-            pg.time.Clock().tick(store.FPS)
+    def resume(self, child: Scene | None):
+        super().resume(child)
+        # The prewarmer still has the prepared map, so a rematch starts right away
+        if isinstance(child, Game) and child.rematch:
+            self.start_game()
 
-            # Draw Map
-            self.screen.blit(self.map_image, (0, 0))
+    def close(self):
+        self.prewarmer.close()
 
-            # Draw Tanks
-            self.draw_tank((140, 100), self.tank_1_index, self.tank_1_color)
-            self.draw_tank((815, 100), self.tank_2_index, self.tank_2_color)
+    def handle_event(self, event: pg.event.Event):
+        """The menu isn't animated, so it's only redrawn after a click."""
 
-            # Event handling
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    running = False
-                elif event.type == pg.MOUSEBUTTONDOWN:
-                    mouse_pos = pg.mouse.get_pos()
+        if event.type == pg.QUIT:
+            self.manager.pop()
+        elif event.type == pg.MOUSEBUTTONDOWN:
+            self.needs_redraw = True
 
-                    for button in self.buttons:
-                        button.try_handle_click(mouse_pos)
+            for button in self.buttons:
+                button.try_handle_click(event.pos)
+            # Nothing is prepared while a match that was just started runs
+            if self.manager.scenes[-1] is self:
+                self.prewarmer.request(self.get_match())
+        elif event.type == MATCH_PREPARED:
+            self.set_map_image()
+            self.needs_redraw = True
 
-            # Draw text
-            self.draw_text("Welcome to the Game!", (self.SIZE[0] // 2, self.SIZE[1] // 5))
+    def draw(self):
+        # Draw Map, or nothing until the first preview is baked
+        if self.map_image:
+            self.screen.blit(self.map_image, (0, 0))
+        else:
+            self.screen.fill(store.BLACK)
 
-            # Draw Stats
-            # Player 1
-            self.draw_text(self.stats, (self.BUTTON_WIDTH * 1, self.BUTTON_HEIGHT + 115))
-            self.draw_text(self.gui_tank_stats[0], (self.BUTTON_WIDTH * 2.5, self.BUTTON_HEIGHT + 115))
-            # Player 2
-            self.draw_text(self.stats, (self.BUTTON_WIDTH * 7.5, self.BUTTON_HEIGHT + 115))
-            self.draw_text(self.gui_tank_stats[1], (self.BUTTON_WIDTH * 8.5, self.BUTTON_HEIGHT + 115))
+        # Draw Tanks
+        self.draw_tank((140, 100), self.tank_1_index, self.tank_1_color)
+        self.draw_tank((815, 100), self.tank_2_index, self.tank_2_color)
 
-            # Draw Buttons
-            for button in self.buttons:
-                button.draw(self.screen)
+        # Draw text
+        self.draw_text("Welcome to the Game!", (self.SIZE[0] // 2, self.SIZE[1] // 5))
 
-            pg.display.flip()
+        # Draw Stats
+        # Player 1
+        self.draw_text(self.stats, (self.BUTTON_WIDTH * 1, self.BUTTON_HEIGHT + 115))
+        self.draw_text(self.gui_tank_stats[0], (self.BUTTON_WIDTH * 2.5, self.BUTTON_HEIGHT + 115))
+        # Player 2
+        self.draw_text(self.stats, (self.BUTTON_WIDTH * 7.5, self.BUTTON_HEIGHT + 115))
+        self.draw_text(self.gui_tank_stats[1], (self.BUTTON_WIDTH * 8.5, self.BUTTON_HEIGHT + 115))
 
-        pg.quit()
+        # Draw Buttons
+        for button in self.buttons:
+            button.draw(self.screen)
 
     def set_map_image(self):
-        map_object = Map(self.map_paths[self.map_index])
-        image = map_object.get_map()
-        scaled_image = pg.transform.smoothscale(image, self.SIZE)
-
-        # Blur the image
-        pil_image = Image.frombytes(
-            "RGB",
-            (scaled_image.get_width(), scaled_image.get_height()),
-            pg.image.tostring(scaled_image, "RGB"),
-        )
-        blurred_pil_image = pil_image.filter(ImageFilter.GaussianBlur())
-        blurred_image = pg.image.frombuffer(
-            blurred_pil_image.tobytes(), blurred_pil_image.size, "RGB"
-        )
-
-        self.map_image = blurred_image
+        # Previews are baked by the prewarmer, the last one stays until the selected is ready
+        map_path = self.map_paths[self.map_index]
+        self.map_image = self.prewarmer.previews.get(map_path, self.map_image)
 
     def draw_tank(self, pos: tuple[int, int], tank_type_number: int, color: int):
-        tank_stats = get_tanks_stats(self.tank_paths[tank_type_number])
+        tank_path = self.tank_paths[tank_type_number]
+        tank_stats = get_tank_type(tank_path)
+        sprites = get_tank_sprites(tank_path, color)
         turret_offset = tank_stats.turret_offset
 
-        tank_image: pg.Surface = store.ASSETS[
-            f"/images/proprietary/tank/Tanks_base/tank{tank_stats.image_type}_color{color}.png"
-        ]
-        turret_image: pg.Surface = store.ASSETS[
-            f"/images/proprietary/tank/Cannons_color{color}/cannon{tank_stats.image_type}_1.png"
-        ]
+        tank_image = sprites.body
+        turret_image = sprites.turret
 
         turret_draw_center = (
-            pos[0] + turret_offset[0] + tank_image.get_width() / 2,
-            pos[1] + turret_offset[1] + tank_image.get_height() / 2,
+            pos[0] + turret_offset[0] * tank_stats.body_scale + tank_image.get_width() / 2,
+            pos[1] + turret_offset[1] * tank_stats.body_scale + tank_image.get_height() / 2,
         )
         _, turret_pos = _rot_center(turret_image, 1, turret_draw_center)
 
@@ -353,4 +342,17 @@ class Window:
 
 
 if __name__ == "__main__":
-    g = Window()
+    # Matches are bigger than the menu, so the window fits the biggest map and only the
+    # menu is letterboxed
+    compiled_maps = [compile_map(store.ASSETS[path]) for path in store.ASSETS if "maps" in path]
+    manager = SceneManager(
+        _fit_window(
+            (
+                max(compiled_map.width for compiled_map in compiled_maps) * TILE_SIZE,
+                max(compiled_map.height for compiled_map in compiled_maps) * TILE_SIZE,
+            )
+        )
+    )
+    manager.push(Menu())
+    manager.run()
+    pg.quit()
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+
+from tanks.caches import tracked_cache
+
+TILE_SIZE = 32
+WALL = "w"
+EMPTY = "e"
+SPAWN = "s"
+TILES = (WALL, EMPTY, SPAWN)
+
+
+class MapError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledMap:
+    """A parsed and validated map, ready to be loaded by the game."""
+
+    width: int
+    height: int
+    tile_map: tuple[tuple[str, ...], ...]
+    # Pixel positions of the tank spawns, in reading order
+    spawns: tuple[tuple[int, int], ...]
+    # Merged wall colliders as pixel rects (x, y, width, height)
+    walls: tuple[tuple[int, int, int, int], ...]
+
+
+def parse_map(text: str) -> tuple[tuple[str, ...], ...]:
+    """Parse the text map format into rows of tiles and validate it."""
+
+    rows = tuple(tuple(line.split()) for line in text.splitlines() if line.strip())
+    if not rows:
+        raise MapError("Map is empty")
+
+    width = len(rows[0])
+    for y, row in enumerate(rows):
+        if len(row) != width:
+            raise MapError(f"Row {y} has {len(row)} tiles, expected {width}")
+        for x, tile in enumerate(row):
+            if tile not in TILES:
+                raise MapError(f"Unknown tile '{tile}' at {x}, {y}")
+
+    return rows
+
+
+def merge_walls(tile_map: tuple[tuple[str, ...], ...]) -> list[tuple[int, int, int, int]]:
+    """
+    Greedily merge wall tiles into axis-aligned rectangles.
+
+    Every free wall tile starts a rectangle that is grown to the right as far as possible
+    and then downwards as long as the whole row span below is still free wall.
+
+    Returns:
+        list[tuple[int, int, int, int]]: The rectangles as tile coordinates (x, y, width, height).
+    """
+
+    height = len(tile_map)
+    width = len(tile_map[0]) if height else 0
+    used = [[False] * width for _ in range(height)]
+    rects = []
+
+    for y in range(height):
+        for x in range(width):
+            if used[y][x] or tile_map[y][x] != WALL:
+                continue
+
+            rect_width = 1
+            while (
+                x + rect_width < width
+                and tile_map[y][x + rect_width] == WALL
+                and not used[y][x + rect_width]
+            ):
+                rect_width += 1
+
+            rect_height = 1
+            while y + rect_height < height and all(
+                tile_map[y + rect_height][i] == WALL and not used[y + rect_height][i]
+                for i in range(x, x + rect_width)
+            ):
+                rect_height += 1
+
+            for row in used[y : y + rect_height]:
+                row[x : x + rect_width] = [True] * rect_width
+            rects.append((x, y, rect_width, rect_height))
+
+    return rects
+
+
+@tracked_cache
+def compile_map(text: str) -> CompiledMap:
+    """Parse, validate and compile a map once. Results are cached per map text."""
+
+    tile_map = parse_map(text)
+
+    spawns = tuple(
+        (x * TILE_SIZE, y * TILE_SIZE)
+        for y, row in enumerate(tile_map)
+        for x, tile in enumerate(row)
+        if tile == SPAWN
+    )
+    if not spawns:
+        raise MapError("Map has no spawns")
+
+    walls = tuple(
+        (x * TILE_SIZE, y * TILE_SIZE, w * TILE_SIZE, h * TILE_SIZE)
+        for x, y, w, h in merge_walls(tile_map)
+    )
+
+    return CompiledMap(len(tile_map[0]), len(tile_map), tile_map, spawns, walls)
@@ -0,0 +1,227 @@
+import time
+
+import numpy as np
+
+from tanks.map_compiler import EMPTY, SPAWN, TILE_SIZE, WALL, compile_map
+
+STRESS_PREFIX = "/stress/"
+# Map sizes of the stress corpus in tiles, from small to very large
+STRESS_SIZES = ((25, 13), (50, 25), (100, 50), (200, 100))
+# Tanks are wider than a tile, so they need this many open tiles in both directions
+TANK_TILES = 2
+
+_CODES = np.frombuffer((EMPTY + WALL + SPAWN).encode(), np.uint8)
+
+
+def _neighbours(walls: np.ndarray) -> np.ndarray:
+    """Number of walls among the 8 neighbours of every tile. Outside the map counts as wall."""
+
+    padded = np.pad(walls, 1, constant_values=True).astype(np.uint8)
+    # The 3x3 sum is separable into a sum over rows and then over columns
+    rows = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+    return rows[:-2] + rows[1:-1] + rows[2:] - walls
+
+
+def _fit_tank(open_tiles: np.ndarray, tank_tiles: int) -> np.ndarray:
+    """
+    Tiles a tank fits on with its top left corner, because the `tank_tiles` square of
+    tiles from there on is open. Tanks move one tile at a time between these, so a flood
+    fill over them only reaches where a tank can actually drive.
+    """
+
+    height, width = open_tiles.shape
+    size = tank_tiles - 1
+    fits = np.zeros_like(open_tiles)
+    corners = fits[: height - size, : width - size]
+    corners[:] = True
+    for dy in range(tank_tiles):
+        for dx in range(tank_tiles):
+            corners &= open_tiles[dy : height - size + dy, dx : width - size + dx]
+    return fits
+
+
+def _tank_area(fits: np.ndarray, tank_tiles: int) -> np.ndarray:
+    """All tiles covered by a tank on any of the tiles it fits on."""
+
+    area = fits.copy()
+    for dy in range(tank_tiles):
+        for dx in range(tank_tiles):
+            area[dy:, dx:] |= fits[: fits.shape[0] - dy, : fits.shape[1] - dx]
+    return area
+
+
+def _label_runs(open_tiles: np.ndarray) -> np.ndarray:
+    """Number the horizontal runs of open tiles, walls are 0. Needs a wall border."""
+
+    flat = open_tiles.ravel()
+    starts = flat.copy()
+    starts[1:] &= ~flat[:-1]
+    return (np.cumsum(starts) * flat).reshape(open_tiles.shape)
+
+
+def _flood(open_tiles: np.ndarray, start: tuple[int, int]) -> np.ndarray:
+    """
+    All open tiles reachable from start.
+
+    Instead of growing one tile per pass, every pass fills whole horizontal and then
+    whole vertical runs of open tiles, so it only takes as many passes as turns in the
+    longest path.
+    """
+
+    rows = _label_runs(open_tiles)
+    columns = _label_runs(open_tiles.T).T
+
+    reached = np.zeros_like(open_tiles)
+    reached[start] = True
+    count = 0
+    while (new_count := np.count_nonzero(reached)) != count:
+        count = new_count
+        for labels in (rows, columns):
+            runs = np.zeros(labels.max() + 1, np.bool_)
+            runs[labels[reached]] = True
+            runs[0] = False
+            reached = runs[labels]
+
+    return reached
+
+
+def _place_spawns(reachable: np.ndarray, count: int, rng: np.random.Generator) -> list[int]:
+    """Pick spawns on the reachable tiles, each as far as possible from the ones before."""
+
+    candidates = np.flatnonzero(reachable)
+    ys, xs = np.divmod(candidates, reachable.shape[1])
+    chosen = [rng.integers(len(candidates))]
+    distance = np.full(len(candidates), np.inf)
+    for _ in range(count - 1):
+        distance = np.minimum(distance, np.hypot(ys - ys[chosen[-1]], xs - xs[chosen[-1]]))
+        chosen.append(int(np.argmax(distance)))
+
+    return [candidates[i] for i in chosen]
+
+
+def generate_map(
+    width: int,
+    height: int,
+    *,
+    seed: int | None = None,
+    spawns: int = 2,
+    fill: float = 0.45,
+    steps: int = 4,
+    tank_tiles: int = TANK_TILES,
+) -> str:
+    """
+    Generate a cave-like map in the text format of the maps in assets/maps.
+
+    Random walls are smoothed by a few cellular automaton passes over the whole grid.
+    Only the area a tank can drive to from a flood fill is kept, everything else becomes
+    wall, so every spawn has room for its tank and can reach every other spawn.
+
+    Args:
+        width (int): Width in tiles, including the outer wall.
+        height (int): Height in tiles, including the outer wall.
+        seed (int | None): Seed for the random generator, the same seed gives the same map.
+        spawns (int): Number of tank spawns.
+        fill (float): Share of tiles that start as wall.
+        steps (int): Number of smoothing passes.
+        tank_tiles (int): Tiles the biggest tank covers in each direction.
+    """
+
+    if width < 5 or height < 5:
+        raise ValueError("Maps need to be at least 5x5 tiles")
+
+    rng = np.random.default_rng(seed)
+    inner = (slice(1, -1), slice(1, -1))
+
+    # Sometimes smoothing closes everything, so try again with the next random walls
+    for _ in range(10):
+        walls = rng.random((height, width)) < fill
+        for _ in range(steps):
+            neighbours = _neighbours(walls)
+            walls = (neighbours >= 5) | (walls & (neighbours == 4))
+        walls[0] = walls[-1] = walls[:, 0] = walls[:, -1] = True
+
+        fits = _fit_tank(~walls, tank_tiles)
+        if fits[inner].sum() >= spawns:
+            break
+    else:
+        raise ValueError(f"Could not generate a {width}x{height} map with open space")
+
+    # Keep the cave around a random tile a tank fits on, or a bigger one if that's a
+    # small pocket
+    fits_count = fits.sum()
+    fits_indices = np.flatnonzero(fits)
+    reachable = None
+    for _ in range(5):
+        start = np.unravel_index(fits_indices[rng.integers(len(fits_indices))], walls.shape)
+        region = _flood(fits, start)
+        if reachable is None or region.sum() > reachable.sum():
+            reachable = region
+        if reachable.sum() * 2 >= fits_count:
+            break
+
+    if reachable.sum() < spawns:
+        raise ValueError(f"Could not generate a {width}x{height} map with {spawns} spawns")
+
+    tiles = np.where(_tank_area(reachable, tank_tiles), 0, 1).astype(np.uint8)
+    tiles.flat[_place_spawns(reachable, spawns, rng)] = 2
+
+    # Tiles separated by spaces, one row per line
+    text = np.full((height, width * 2), ord(" "), np.uint8)
+    text[:, 0::2] = _CODES[tiles]
+    text[:, -1] = ord("\n")
+    return text.tobytes().decode()
+
+
+def generate_corpus(
+    sizes: tuple[tuple[int, int], ...] = STRESS_SIZES,
+    count: int = 4,
+    seed: int = 0,
+    tank_tiles: int = TANK_TILES,
+) -> dict[str, str]:
+    """Generate `count` maps of each size. Keys are asset paths like "/stress/100x50_0.txt"."""
+
+    return {
+        f"{STRESS_PREFIX}{width}x{height}_{i}.txt": generate_map(
+            width, height, seed=seed * 1000 + i, tank_tiles=tank_tiles
+        )
+        for width, height in sizes
+        for i in range(count)
+    }
+
+
+def register_corpus(**kwargs) -> list[str]:
+    """Add a generated corpus to the assets, so it can be loaded like any other map."""
+
+    # Loading the assets starts pygame, which generating and benchmarking maps don't need
+    import tanks.store as store
+    from tanks.tank_types import get_tank_sprites, get_tank_types
+
+    # Room for the biggest tank, whose box is as wide as its body is narrow
+    tank_size = max(min(get_tank_sprites(path, 1).body.get_size()) for path in get_tank_types())
+    kwargs.setdefault("tank_tiles", -(-tank_size // TILE_SIZE))
+
+    corpus = generate_corpus(**kwargs)
+    store.ASSETS.update(corpus)
+    return list(corpus)
+
+
+def benchmark(maps: int = 200):
+    """Report the generated and the compiled maps per second for every stress size."""
+
+    for width, height in (*STRESS_SIZES, (400, 200)):
+        start = time.perf_counter()
+        texts = [generate_map(width, height, seed=seed) for seed in range(maps)]
+        generated = time.perf_counter()
+        for text in texts:
+            compile_map(text)
+        compiled = time.perf_counter()
+        compile_map.cache_clear()
+
+        print(
+            f"{width}x{height}: {maps / (generated - start):.0f} generated, "
+            f"{maps / (compiled - generated):.0f} compiled maps per second"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
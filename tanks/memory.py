@@ -0,0 +1,156 @@
+import warnings
+from dataclasses import dataclass, field, fields, is_dataclass
+from weakref import WeakSet
+
+import pygame as pg
+
+import tanks.store as store
+from tanks.caches import CACHES, bounded_cache, tracked_cache  # noqa: F401
+
+# All maps that baked an image and are still alive
+BAKED_MAPS: WeakSet = WeakSet()
+
+
+def surface_bytes(surface: pg.Surface) -> int:
+    # Subsurfaces share the pixels of their parent
+    if surface.get_parent():
+        return 0
+    return surface.get_pitch() * surface.get_height()
+
+
+def sound_bytes(sound: pg.mixer.Sound) -> int:
+    if not pg.mixer.get_init():
+        return 0
+    frequency, size, channels = pg.mixer.get_init()
+    return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+
+def _surface_format(surface: pg.Surface) -> str:
+    alpha = " alpha" if surface.get_flags() & pg.SRCALPHA else ""
+    return f"{surface.get_bitsize()} bit{alpha}"
+
+
+@dataclass()
+class MemoryReport:
+    # Bytes of the loaded assets, grouped by directory
+    assets: dict[str, int] = field(default_factory=dict)
+    # Number of entries and bytes of each cache
+    caches: dict[str, tuple[int, int]] = field(default_factory=dict)
+    # Bytes of each baked map
+    baked_maps: list[int] = field(default_factory=list)
+    # Number of surfaces per pixel format
+    surface_formats: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return (
+            sum(self.assets.values())
+            + sum(size for _, size in self.caches.values())
+            + sum(self.baked_maps)
+        )
+
+
+def _measure(value: any, seen: set[int], formats: dict[str, int]) -> int:
+    """Bytes of pixels and samples held by a value. Everything is only counted once."""
+
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, pg.Surface):
+        name = _surface_format(value)
+        formats[name] = formats.get(name, 0) + 1
+        return surface_bytes(value)
+    if isinstance(value, pg.mixer.Sound):
+        return sound_bytes(value)
+    if isinstance(value, pg.mask.Mask):
+        width, height = value.get_size()
+        return width * height // 8
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(_measure(item, seen, formats) for item in value)
+    if isinstance(value, dict):
+        return sum(_measure(item, seen, formats) for item in value.values())
+    if is_dataclass(value):
+        return sum(_measure(getattr(value, f.name), seen, formats) for f in fields(value))
+
+    return 0
+
+
+def collect_report() -> MemoryReport:
+    report = MemoryReport()
+    seen: set[int] = set()
+
+    for path, asset in store.ASSETS.items():
+        group = path.rsplit("/", 1)[0] or "/"
+        size = _measure(asset, seen, report.surface_formats)
+        report.assets[group] = report.assets.get(group, 0) + size
+
+    for name, cache in CACHES.items():
+        size = _measure(list(cache.entries.values()), seen, report.surface_formats)
+        report.caches[name] = (len(cache.entries), size)
+
+    for baked_map in BAKED_MAPS:
+        surfaces = (baked_map.surface, baked_map.image)
+        report.baked_maps.append(_measure(surfaces, seen, report.surface_formats))
+
+    return report
+
+
+def check_budget(report: MemoryReport, budget_mb: float | None = None) -> bool:
+    """Warn if the accounted memory is above the budget. Returns True if within budget."""
+
+    budget_mb = store.MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+    total_mb = report.total / 2**20
+    if total_mb > budget_mb:
+        message = f"Memory budget exceeded: {total_mb:.1f} MB of {budget_mb} MB"
+        warnings.warn(message, ResourceWarning)
+        return False
+
+    return True
+
+
+def format_report(report: MemoryReport, *, short: bool = False) -> list[str]:
+    def mb(size: int) -> str:
+        return f"{size / 2**20:.1f} MB"
+
+    lines = [
+        f"Total: {mb(report.total)}",
+        f"Assets: {mb(sum(report.assets.values()))}",
+        f"Caches: {mb(sum(size for _, size in report.caches.values()))}",
+        f"Maps: {len(report.baked_maps)}, {mb(sum(report.baked_maps))}",
+    ]
+    if short:
+        return lines
+
+    lines.append("")
+    lines.append("Assets:")
+    for group, size in sorted(report.assets.items(), key=lambda item: -item[1]):
+        lines.append(f"  {group}: {mb(size)}")
+    lines.append("Caches:")
+    for name, (entries, size) in sorted(report.caches.items(), key=lambda item: -item[1][1]):
+        lines.append(f"  {name}: {entries} entries, {mb(size)}")
+    lines.append("Surfaces:")
+    for name, count in sorted(report.surface_formats.items()):
+        lines.append(f"  {name}: {count}")
+
+    return lines
+
+
+def print_report():
+    """Print the full report and warn if it is over the budget."""
+
+    report = collect_report()
+    print("\n".join(format_report(report)), flush=True)
+    check_budget(report)
+
+
+if __name__ == "__main__":
+    # A fresh process only has the assets and empty caches. Press MEMORY_REPORT_KEY in the
+    # running game to see how the caches and maps of a session grow.
+    # Run as a script this module is __main__, so use the instance the game registers with
+    import tanks.game  # noqa: F401
+    from tanks import memory
+
+    memory.print_report()
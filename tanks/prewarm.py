@@ -0,0 +1,138 @@
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pygame as pg
+from PIL import Image, ImageFilter
+
+import tanks.store as store
+from tanks.effects import EFFECT_TYPES, _load_effect_type
+from tanks.game import Map, _rotate_surface, _scale_surface, _scale_surface_by
+from tanks.map_compiler import compile_map
+from tanks.quality import QUALITY_LEVELS
+from tanks.tank_types import get_tank_sprites, load_tank_sprites
+
+# Directions a tank body is drawn in, see `Tank.draw`
+BODY_ANGLES = (0, 45, 90, 135, 180, -45, -90, -135)
+# Posted when a preparation finished, with the key of the match as `key`
+MATCH_PREPARED = pg.event.custom_type()
+
+# The map path and the type and color of each tank
+MatchKey = tuple[str, tuple[tuple[str, int], ...]]
+
+
+def _warm_rotations(shared: pg.Surface, private: pg.Surface, scale: float, angles):
+    """
+    Fill the caches the game looks up with `shared` by transforming `private`, an equal
+    copy no other thread knows about. Transforming a surface locks it, and the main
+    thread can't blit `shared` while it's locked.
+    """
+
+    key = shared
+    if scale != 1:
+        private = pg.transform.scale_by(private, scale)
+        key = _scale_surface_by.entries.get((shared, scale), private)
+
+    for angle in angles:
+        if (key, angle) not in _rotate_surface.entries:
+            _rotate_surface.entries.setdefault((key, angle), pg.transform.rotate(private, angle))
+
+    # Only shared once its rotations are done
+    if key is private:
+        _scale_surface_by.entries.setdefault((shared, scale), private)
+
+
+def bake_preview(image: pg.Surface, size: tuple[int, int]) -> pg.Surface:
+    """Scale and blur a map image for the menu background."""
+
+    scaled_image = pg.transform.smoothscale(image, size)
+    pil_image = Image.frombytes("RGB", size, pg.image.tostring(scaled_image, "RGB"))
+    blurred_pil_image = pil_image.filter(ImageFilter.GaussianBlur())
+    return pg.image.frombuffer(blurred_pil_image.tobytes(), blurred_pil_image.size, "RGB")
+
+
+def prepare_match(key: MatchKey) -> Map:
+    """
+    Do the expensive work of starting a match: bake the map, compile its colliders and
+    fill the sprite caches with the scaled and rotated sprites the first frames need.
+    """
+
+    map_path, tanks = key
+    compile_map(store.ASSETS[map_path])
+    game_map = Map(map_path)
+
+    # The game starts at the highest quality level
+    quality = QUALITY_LEVELS[0]
+    scale = store.RENDER_SCALE * quality.render_scale
+    angles = range(0, 360, quality.rotation_step)
+
+    for tank_type, color in tanks:
+        sprites = get_tank_sprites(tank_type, color)
+        private = load_tank_sprites(tank_type, color)
+        _warm_rotations(sprites.body, private.body, scale, BODY_ANGLES)
+        _warm_rotations(sprites.turret, private.turret, scale, angles)
+
+    shell = store.ASSETS["/images/shell.png"]
+    _warm_rotations(
+        _scale_surface(shell, (20, 20)), pg.transform.scale(shell, (20, 20)), scale, angles
+    )
+
+    for name in EFFECT_TYPES:
+        _load_effect_type(name, scale)
+
+    return game_map
+
+
+class Prewarmer:
+    """
+    Prepares the next match on a worker thread while the menu is open.
+
+    `request` is called whenever the selection changes and replaces any preparation that
+    hasn't started yet. `take` hands out a copy of the prepared map if it matches the
+    match being started, waiting for it if it is still being prepared. Maps are changed
+    by a match, so the prepared one is kept unchanged and rematches get copies of it too.
+
+    The worker also keeps a blurred preview of every map it baked in `previews`.
+    """
+
+    def __init__(self, preview_size: tuple[int, int]):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+        self.preview_size = preview_size
+        self.previews: dict[str, pg.Surface] = {}
+        self.key: MatchKey | None = None
+        self.future: Future | None = None
+
+    def prepare(self, key: MatchKey) -> Map:
+        game_map = prepare_match(key)
+        map_path = key[0]
+        if map_path not in self.previews:
+            self.previews[map_path] = bake_preview(game_map.get_map(), self.preview_size)
+        pg.event.post(pg.event.Event(MATCH_PREPARED, key=key))
+        return game_map
+
+    def request(self, key: MatchKey):
+        if key == self.key:
+            return
+
+        # Made here, so the worker never races the menu to create the shared sprites
+        for tank_type, color in key[1]:
+            get_tank_sprites(tank_type, color)
+
+        if self.future:
+            self.future.cancel()
+        self.key = key
+        self.future = self.executor.submit(self.prepare, key)
+
+    def take(self, key: MatchKey) -> Map | None:
+        if key != self.key or self.future.cancelled():
+            return None
+
+        try:
+            return self.future.result().copy()
+        except Exception as error:
+            # Prepared again on the next request
+            self.key = None
+            warnings.warn(f"Preparing {key[0]} failed, baking it now: {error!r}", RuntimeWarning)
+            return Map(key[0])
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,89 @@
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class QualityLevel:
+    name: str
+    # Share of particles spawned by effect bursts
+    particles: float
+    # Animation frames skipped by effects, 1 shows every frame
+    frame_step: int
+    # Rotation angles are rounded to multiples of this many degrees
+    rotation_step: int
+    # Show health and ammo bars for tanks with full health and ammo
+    all_bars: bool
+    # Internal render scale of the game screen
+    render_scale: float
+
+
+QUALITY_LEVELS = (
+    QualityLevel("high", 1, 1, 1, True, 1),
+    QualityLevel("medium", 0.5, 1, 3, True, 1),
+    QualityLevel("low", 0.25, 2, 6, False, 0.75),
+    QualityLevel("lowest", 0, 3, 10, False, 0.5),
+)
+
+
+class QualityGovernor:
+    """
+    Steps the quality level down when frames take longer than the budget and back up
+    when there is headroom again.
+
+    Frame times are averaged over a rolling window. Lowering and raising use different
+    thresholds and every change is followed by a cooldown, so the level doesn't oscillate.
+    """
+
+    def __init__(
+        self,
+        budget: float,
+        *,
+        window: int = 60,
+        cooldown: int = 120,
+        lower_threshold: float = 1.0,
+        raise_threshold: float = 0.6,
+    ):
+        self.budget = budget
+        self.cooldown = cooldown
+        self.lower_threshold = lower_threshold
+        self.raise_threshold = raise_threshold
+
+        self.frame_times: deque[float] = deque(maxlen=window)
+        self.total = 0.0
+        self.frames_since_change = 0
+        self.level_index = 0
+
+    @property
+    def level(self) -> QualityLevel:
+        return QUALITY_LEVELS[self.level_index]
+
+    def record(self, frame_time: float) -> bool:
+        """Record the work time of a frame in ms. Returns True if the level changed."""
+
+        if len(self.frame_times) == self.frame_times.maxlen:
+            self.total -= self.frame_times[0]
+        self.frame_times.append(frame_time)
+        self.total += frame_time
+        self.frames_since_change += 1
+
+        if self.frames_since_change < self.cooldown:
+            return False
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return False
+
+        average = self.total / len(self.frame_times)
+        lowest = len(QUALITY_LEVELS) - 1
+        if average > self.budget * self.lower_threshold and self.level_index < lowest:
+            self.set_level(self.level_index + 1)
+            return True
+        if average < self.budget * self.raise_threshold and self.level_index > 0:
+            self.set_level(self.level_index - 1)
+            return True
+
+        return False
+
+    def set_level(self, index: int):
+        self.level_index = index
+        self.frames_since_change = 0
+        self.frame_times.clear()
+        self.total = 0.0
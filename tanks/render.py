@@ -0,0 +1,77 @@
+from math import ceil
+
+import pygame as pg
+
+from tanks import memory
+
+# Layers of the render queue, drawn from bottom to top
+BODIES = 0
+TURRETS = 1
+SHELLS = 2
+BARS = 3
+LAYERS = 4
+
+# A line of a bar strip: color, start, end and width
+Line = tuple[tuple[int, int, int], tuple[float, float], tuple[float, float], int]
+
+
+@memory.tracked_cache
+def bar_strip(lines: tuple[Line, ...]) -> pg.Surface:
+    """
+    Pre-render lines, like the health and ammo bars, into one small surface.
+
+    The lines are drawn exactly like with `pg.draw.line`, offset by the widest line so
+    thick lines starting at 0 aren't cut off. Blit the strip at `strip_pos`.
+    """
+
+    pad = max(width for *_, width in lines)
+    right = max(max(start[0], end[0]) for _, start, end, _ in lines)
+    bottom = max(max(start[1], end[1]) for _, start, end, _ in lines)
+
+    strip = pg.Surface((ceil(right) + 2 * pad, ceil(bottom) + 2 * pad), pg.SRCALPHA)
+    for color, start, end, width in lines:
+        pg.draw.line(
+            strip, color, (start[0] + pad, start[1] + pad), (end[0] + pad, end[1] + pad), width
+        )
+
+    return strip
+
+
+def strip_pos(lines: tuple[Line, ...], pos: tuple[int, int]) -> tuple[int, int]:
+    pad = max(width for *_, width in lines)
+    return pos[0] - pad, pos[1] - pad
+
+
+class RenderQueue:
+    """
+    Collects the sprites of all entities during a frame and blits them at once.
+
+    Entities submit (surface, position) pairs to a layer instead of blitting them
+    themselves. `flush` draws every layer with a single `Surface.blits` call, or
+    `fblits` where pygame provides it, so the cost per sprite stays small no matter
+    how many entities there are.
+    """
+
+    def __init__(self):
+        self.layers: list[list[tuple[pg.Surface, tuple[int, int]]]] = [
+            [] for _ in range(LAYERS)
+        ]
+
+    def submit(self, layer: int, surface: pg.Surface, pos: tuple[int, int] | pg.Rect):
+        self.layers[layer].append((surface, pos))
+
+    def submit_bar(self, lines: tuple[Line, ...], pos: tuple[int, int]):
+        """Submit lines, like a health bar, as a cached strip with its origin at pos."""
+        self.layers[BARS].append((bar_strip(lines), strip_pos(lines, pos)))
+
+    def flush(self, screen: pg.Surface):
+        fblits = getattr(screen, "fblits", None)
+        for layer in self.layers:
+            if not layer:
+                continue
+
+            if fblits:
+                fblits(layer)
+            else:
+                screen.blits(layer, doreturn=False)
+            layer.clear()
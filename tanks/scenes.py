@@ -0,0 +1,146 @@
+import pygame as pg
+
+import tanks.store as store
+from tanks import memory
+
+# Events whose position is converted from the window to the scene
+_POSITION_EVENTS = (pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.MOUSEMOTION)
+
+
+class Scene:
+    """
+    A screen of the game, like the menu or a match.
+
+    A scene draws onto its own `screen` surface, which has the aspect ratio of its
+    logical `SIZE`. It is kept alive while other scenes are pushed on top of it, so
+    everything it prepared is still there when it is shown again.
+    """
+
+    SIZE: tuple[int, int] = (0, 0)
+    caption = "Tanks"
+    # Animated scenes are updated every tick, the others only redraw after events
+    animated = False
+
+    def __init__(self):
+        self.manager: SceneManager | None = None
+        self.screen: pg.Surface | None = None
+        self.needs_redraw = True
+
+    def resume(self, child: "Scene | None"):
+        """Called when the scene is shown, with the scene that was popped off it, if any."""
+        self.needs_redraw = True
+
+    def close(self):
+        """Called when the scene is popped."""
+
+    def handle_event(self, event: pg.event.Event):
+        pass
+
+    def update(self):
+        pass
+
+    def draw(self):
+        pass
+
+
+class SceneManager:
+    """
+    Runs a stack of scenes in a single window that is created once.
+
+    Only the top scene gets events and is drawn. Its screen is scaled onto the window,
+    letterboxed to keep the aspect ratio, so scenes of any size share the window and
+    switching between them never sets the display mode again.
+    """
+
+    def __init__(self, size: tuple[int, int]):
+        pg.display.set_mode(size, pg.RESIZABLE)
+        self.scenes: list[Scene] = []
+
+        self.viewport = pg.Rect(0, 0, *size)
+        self.viewport_surface: pg.Surface | None = None
+        # The window and screen size the viewport was calculated for
+        self.viewport_key: tuple | None = None
+
+    def push(self, scene: Scene):
+        scene.manager = self
+        self.scenes.append(scene)
+        self.show(None)
+
+    def pop(self) -> Scene:
+        scene = self.scenes.pop()
+        scene.close()
+        scene.manager = None
+        if self.scenes:
+            self.show(scene)
+        return scene
+
+    def show(self, child: Scene | None):
+        scene = self.scenes[-1]
+        pg.display.set_caption(scene.caption)
+        # The window may still show the previous scene around the viewport
+        self.viewport_key = None
+        scene.resume(child)
+
+    def to_scene(self, pos: tuple[int, int], scene: Scene) -> tuple[int, int]:
+        """Convert window coordinates, like mouse positions, to scene coordinates."""
+        return (
+            int((pos[0] - self.viewport.x) * scene.SIZE[0] / self.viewport.width),
+            int((pos[1] - self.viewport.y) * scene.SIZE[1] / self.viewport.height),
+        )
+
+    def present(self, screen: pg.Surface):
+        """Scale a screen onto the window, letterboxed to keep the aspect ratio."""
+
+        window = pg.display.get_surface()
+        key = (window.get_size(), screen.get_size())
+        if key != self.viewport_key or self.viewport_surface is None:
+            self.viewport_key = key
+            size = screen.get_size()
+            factor = min(window.get_width() / size[0], window.get_height() / size[1])
+            self.viewport = pg.Rect(0, 0, int(size[0] * factor), int(size[1] * factor))
+            self.viewport.center = window.get_rect().center
+
+            window.fill(store.BLACK)
+            self.viewport_surface = window.subsurface(self.viewport)
+
+        if screen.get_size() == self.viewport.size:
+            self.viewport_surface.blit(screen, (0, 0))
+        else:
+            pg.transform.scale(screen, self.viewport.size, self.viewport_surface)
+
+        pg.display.flip()
+
+    def run(self):
+        """Run the scenes until the last one is popped."""
+
+        while self.scenes:
+            scene = self.scenes[-1]
+            if scene.animated:
+                scene.update()
+                # The scene may have ended itself
+                if not self.scenes or scene is not self.scenes[-1]:
+                    continue
+
+            if scene.animated or scene.needs_redraw:
+                scene.draw()
+                self.present(scene.screen)
+                scene.needs_redraw = False
+
+            # Scenes that aren't animated block until something happens
+            events = pg.event.get() if scene.animated else [pg.event.wait(), *pg.event.get()]
+            for event in events:
+                if event.type == pg.VIDEORESIZE:
+                    self.viewport_surface = None
+                if event.type in (pg.WINDOWEXPOSED, pg.WINDOWRESTORED, pg.WINDOWSIZECHANGED):
+                    scene.needs_redraw = True
+                if event.type == pg.KEYDOWN and event.key == store.MEMORY_REPORT_KEY:
+                    memory.print_report()
+                if event.type in _POSITION_EVENTS:
+                    event = pg.event.Event(
+                        event.type, {**event.dict, "pos": self.to_scene(event.pos, scene)}
+                    )
+
+                scene.handle_event(event)
+                # Events after a switch belong to the next scene
+                if not self.scenes or scene is not self.scenes[-1]:
+                    break
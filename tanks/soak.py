@@ -0,0 +1,227 @@
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+# Soak tests never open a window or play sounds
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+
+import tanks.store as store
+from tanks import memory
+from tanks.controls import get_controls
+from tanks.main import Menu
+from tanks.scenes import SceneManager
+
+
+def rss_bytes() -> int:
+    """The current resident set size, or the peak where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    cycle: int
+    rss: int
+    surfaces: int
+    cache_entries: dict[str, int]
+
+    @property
+    def total_entries(self) -> int:
+        return sum(self.cache_entries.values())
+
+
+def take_sample(cycle: int) -> Sample:
+    gc.collect()
+    report = memory.collect_report()
+    return Sample(
+        cycle,
+        rss_bytes(),
+        sum(report.surface_formats.values()),
+        {name: cache_entries for name, (cache_entries, _) in report.caches.items()},
+    )
+
+
+class ScriptedKeyboard:
+    """
+    Stands in for `pg.key.get_pressed` during a soak and presses random keys.
+
+    It is sampled once per tick, so it also counts the frames of the match. Once a
+    match is long enough, it quits the game and lets the driver continue in the menu.
+    """
+
+    def __init__(self, soak: "Soak"):
+        self.soak = soak
+        self.frame = 0
+        self.pressed: dict[int, bool] = {}
+
+    def __call__(self) -> "ScriptedKeyboard":
+        self.frame += 1
+        if self.frame == 1:
+            self.soak.start_match()
+        elif self.frame == self.soak.match_frames:
+            pg.event.post(pg.event.Event(pg.QUIT))
+            self.soak.end_match()
+
+        # Hold random keys for a while like a player would
+        if self.frame % 10 == 1:
+            keys = [key for bindings in get_controls().bindings for key, _ in bindings.keys]
+            self.pressed = {key: self.soak.rng.random() < 0.3 for key in keys}
+        return self
+
+    def __getitem__(self, key: int) -> bool:
+        return self.pressed.get(key, False)
+
+
+class Soak:
+    """
+    Cycles the real menu through hundreds of matches and credits, sampling memory
+    at the start of every match.
+
+    Matches are played by the scripted keyboard. Clicks in the menu are posted from a
+    driver thread, since the menu blocks while waiting for events. Every cycle moves on
+    to the next map. During the warmup the tanks are changed too, which picks random
+    colors, afterwards the same maps and tanks come around again and again.
+    """
+
+    def __init__(
+        self, cycles: int, warmup: int, match_frames: int, credits_every: int, seed: int
+    ):
+        self.cycles = cycles
+        self.warmup = warmup
+        self.match_frames = match_frames
+        self.credits_every = credits_every
+        self.rng = random.Random(seed)
+
+        self.cycle = 0
+        self.samples: list[Sample] = []
+        self.keyboard = ScriptedKeyboard(self)
+        self.match_ended = threading.Event()
+
+    def run(self) -> list[Sample]:
+        get_controls().keyboard = self.keyboard
+        manager = SceneManager(Menu.SIZE)
+        menu = Menu()
+        manager.push(menu)
+
+        threading.Thread(target=self.drive, args=(menu,), daemon=True).start()
+        manager.run()
+        return self.samples
+
+    def start_match(self):
+        self.samples.append(take_sample(self.cycle))
+        sample = self.samples[-1]
+        print(
+            f"cycle {sample.cycle}: {sample.rss / 2**20:.1f} MB RSS, "
+            f"{sample.surfaces} surfaces, {sample.total_entries} cache entries",
+            flush=True,
+        )
+
+    def end_match(self):
+        self.keyboard.frame = -1
+        self.match_ended.set()
+
+    def click(self, pos: tuple[int, int]):
+        pg.event.post(pg.event.Event(pg.MOUSEBUTTONDOWN, pos=pos, button=1))
+        time.sleep(0.1)
+
+    def drive(self, menu: Menu):
+        buttons = {getattr(b.on_click, "__name__", ""): b for b in menu.buttons}
+        credits = buttons["show_credits"].box.center
+        start = buttons["on_click_start"].bounds.center
+        next_map = buttons["on_click_map_right"].bounds.center
+        tank_arrows = [b.bounds.center for name, b in buttons.items() if "player" in name]
+
+        while self.cycle < self.cycles:
+            self.click(next_map)
+            if self.cycle < self.warmup:
+                for _ in range(self.rng.randint(0, 2)):
+                    self.click(self.rng.choice(tank_arrows))
+
+            if self.credits_every and self.cycle % self.credits_every == self.credits_every - 1:
+                self.click(credits)
+                time.sleep(0.2)
+                pg.event.post(pg.event.Event(pg.QUIT))
+                time.sleep(0.2)
+
+            self.match_ended.clear()
+            self.click(start)
+            self.match_ended.wait()
+            self.cycle += 1
+            time.sleep(0.2)
+
+        self.samples.append(take_sample(self.cycle))
+        pg.event.post(pg.event.Event(pg.QUIT))
+
+
+def check_growth(
+    samples: list[Sample],
+    baseline_cycle: int,
+    max_rss_mb: float,
+    max_surfaces: int,
+    max_entries: int,
+) -> list[str]:
+    """Compare the baseline and the last sample. Returns what grew too much."""
+
+    baseline, last = next(s for s in samples if s.cycle >= baseline_cycle), samples[-1]
+    failures = []
+    rss_growth = (last.rss - baseline.rss) / 2**20
+    if rss_growth > max_rss_mb:
+        failures.append(f"RSS grew by {rss_growth:.1f} MB")
+    if last.surfaces - baseline.surfaces > max_surfaces:
+        failures.append(f"Surfaces grew by {last.surfaces - baseline.surfaces}")
+    for name, entries in last.cache_entries.items():
+        growth = entries - baseline.cache_entries.get(name, 0)
+        if growth > max_entries:
+            failures.append(f"{name} grew by {growth} entries")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test the menu, game and credits.")
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=50, help="Cycles that change the tanks")
+    parser.add_argument("--match-frames", type=int, default=240)
+    parser.add_argument("--credits-every", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=600, help="Run matches faster than usual")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rss-mb", type=float, default=50)
+    parser.add_argument("--max-surfaces", type=int, default=100)
+    parser.add_argument("--max-entries", type=int, default=500)
+    args = parser.parse_args()
+
+    store.FPS = args.fps
+    store.ADAPTIVE_QUALITY = False
+
+    # Every map has been played with the final tanks once the baseline is taken
+    maps = sum("maps" in path for path in store.ASSETS)
+    baseline_cycle = args.warmup + maps
+    if args.cycles <= baseline_cycle:
+        parser.error(f"--cycles has to be more than --warmup plus the {maps} maps")
+
+    soak = Soak(args.cycles, args.warmup, args.match_frames, args.credits_every, args.seed)
+    samples = soak.run()
+    failures = check_growth(
+        samples, baseline_cycle, args.max_rss_mb, args.max_surfaces, args.max_entries
+    )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(samples)} samples without leaks")
+
+
+if __name__ == "__main__":
+    main()
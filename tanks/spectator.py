@@ -0,0 +1,223 @@
+import asyncio
+import json
+import selectors
+import socket
+import sys
+import threading
+import time
+from queue import SimpleQueue
+from random import Random
+
+import pygame as pg
+
+import tanks.store as store
+from tanks.broadcast import (
+    HEADER, HELLO, LENGTH, SHELL, TANK, TILE, NullSpectatorServer, SpectatorServer
+)
+from tanks.game import Bullet, Game, Map
+from tanks.scenes import Scene, SceneManager
+
+
+def read_messages(sock: socket.socket, messages: SimpleQueue):
+    """Read the messages of a spectator server into a queue. None marks the end."""
+
+    stream = sock.makefile("rb")
+    try:
+        while len(prefix := stream.read(LENGTH.size)) == LENGTH.size:
+            messages.put(stream.read(LENGTH.unpack(prefix)[0]))
+    except OSError:
+        pass
+    messages.put(None)
+
+
+class SpectatorView(Scene):
+    """
+    Shows the match broadcast by a `SpectatorServer`.
+
+    Every hello sets up a `Game` like the one being played, with the map baked from
+    the same seed. It is never stepped, the frames set the state of its tanks, shells
+    and walls, and it draws itself like any other game.
+    """
+
+    SIZE = (1040, 520)
+    caption = "Spectator"
+    animated = True
+
+    def __init__(self, host: str, port: int):
+        super().__init__()
+        self.clock = pg.time.Clock()
+        self.screen = pg.Surface(self.SIZE)
+        self.game: Game | None = None
+
+        self.messages: SimpleQueue[bytes | None] = SimpleQueue()
+        self.sock = socket.create_connection((host, port))
+        threading.Thread(
+            target=read_messages, args=(self.sock, self.messages), daemon=True
+        ).start()
+
+    def start_match(self, hello: dict[str, object]):
+        self.game = Game(
+            hello["map"],
+            [
+                {"type": tank_type, "color": color, "input": lambda: 0}
+                for tank_type, color in hello["tanks"]
+            ],
+            game_map=Map(hello["map"], hello["seed"]),
+        )
+        # Spectators see everything
+        self.game.fog = None
+        self.SIZE = self.game.SIZE
+
+    def apply_frame(self, frame: bytes):
+        game = self.game
+        _, game.frame, game.end_animation_frame, tanks, shells, tiles = HEADER.unpack_from(frame)
+        offset = HEADER.size
+
+        for _ in range(tanks):
+            i, x, y, draw_angle, turret_angle, health, ammo, destroyed = TANK.unpack_from(
+                frame, offset
+            )
+            offset += TANK.size
+
+            tank = game.tanks[i]
+            tank.box.topleft = (x, y)
+            tank.draw_angle = draw_angle
+            tank.turret_angle = turret_angle
+            tank.health = health
+            tank.current_ammo = ammo
+            if destroyed and not tank.is_destroyed:
+                tank.is_destroyed = True
+                tank.image = tank.sprites.broken_body
+                tank.turret_image = tank.sprites.broken_turret
+                game.effects.spawn("big_explosion", tank.box.center)
+
+        game.entities = [entity for entity in game.entities if not isinstance(entity, Bullet)]
+        for _ in range(shells):
+            x, y, angle = SHELL.unpack_from(frame, offset)
+            offset += SHELL.size
+            game.entities.append(Bullet(game, (x, y), angle, 0, 0, "spectator"))
+
+        for _ in range(tiles):
+            x, y = TILE.unpack_from(frame, offset)
+            offset += TILE.size
+            game.damage_wall(x, y, store.WALL_HEALTH)
+
+        game.effects.update()
+
+    def update(self):
+        self.clock.tick(store.FPS)
+
+        # Apply everything that arrived, deltas only make sense in order
+        while not self.messages.empty():
+            message = self.messages.get()
+            if message is None:
+                self.manager.pop()
+                return
+
+            if message[0] == HELLO:
+                self.start_match(json.loads(message[1:]))
+            elif self.game:
+                self.apply_frame(message)
+
+    def draw(self):
+        if self.game:
+            self.game.draw()
+            self.screen = self.game.screen
+        else:
+            self.screen.fill(store.BLACK)
+            text = store.generate_text("Waiting for a match")
+            self.screen.blit(text, text.get_rect(center=self.screen.get_rect().center))
+
+    def handle_event(self, event: pg.event.Event):
+        if event.type == pg.QUIT:
+            self.manager.pop()
+
+    def close(self):
+        self.sock.close()
+
+
+def _drain(sockets: list[socket.socket], received: list[int], stop: threading.Event):
+    selector = selectors.DefaultSelector()
+    for i, sock in enumerate(sockets):
+        selector.register(sock, selectors.EVENT_READ, i)
+    while not stop.is_set():
+        for key, _ in selector.select(0.05):
+            received[key.data] += len(key.fileobj.recv(65536))
+    selector.close()
+
+
+def benchmark(viewer_counts: tuple[int, ...] = (0, 10, 100, 300), ticks: int = 1200):
+    """
+    Step a headless match with many viewers that read everything, plus one that reads
+    nothing. Reports what broadcasting costs the game thread per tick and how many
+    frames the stalled viewer skipped.
+    """
+
+    server = SpectatorServer("127.0.0.1", 0)
+    for count in viewer_counts:
+        viewers = [socket.create_connection(("127.0.0.1", server.port)) for _ in range(count)]
+        stalled = socket.socket()
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.connect(("127.0.0.1", server.port))
+        while len(server.viewers) < count + 1:
+            time.sleep(0.01)
+
+        received = [0] * count
+        stop = threading.Event()
+        reader = threading.Thread(target=_drain, args=(viewers, received, stop))
+        reader.start()
+
+        rng = Random(0)
+        game = Game(
+            "/maps/gras1.txt",
+            [
+                {"type": "/types/tank.json", "color": 1, "input": lambda: rng.randrange(128)},
+                {"type": "/types/sniper.json", "color": 2, "input": lambda: rng.randrange(128)},
+            ],
+            headless=True,
+            seed=0,
+        )
+        game.spectators = NullSpectatorServer()
+
+        publishing = 0.0
+        start = time.perf_counter()
+        for _ in range(ticks):
+            game.step()
+            publish_start = time.perf_counter()
+            server.publish(game)
+            publishing += time.perf_counter() - publish_start
+        elapsed = time.perf_counter() - start
+
+        # Wait until the loop has sent every frame and the readers got them
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), server.loop).result()
+        time.sleep(0.2)
+        stop.set()
+        reader.join()
+        skipped = next(v.skipped for w, v in server.viewers.items() if w.get_extra_info(
+            "peername"
+        ) == stalled.getsockname())
+        print(
+            f"{count} viewers: {publishing / ticks * 1e6:.0f} us publishing and "
+            f"{elapsed / ticks * 1e6:.0f} us per tick, "
+            f"{min(received, default=0) // 1024} KiB to the slowest reader, "
+            f"{skipped} frames skipped by the stalled viewer"
+        )
+
+        for sock in (*viewers, stalled):
+            sock.close()
+        while server.viewers:
+            time.sleep(0.01)
+
+    server.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["benchmark"]:
+        benchmark()
+    else:
+        host = sys.argv[1] if len(sys.argv) > 1 else store.SPECTATOR_HOST
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else store.SPECTATOR_PORT
+        manager = SceneManager(SpectatorView.SIZE)
+        manager.push(SpectatorView(host, port))
+        manager.run()
+        pg.quit()
@@ -12,7 +12,7 @@ pg.font.init()
 pg.mixer.init()
 
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class TankStats:
     health: int
     max_speed: int
@@ -23,13 +23,12 @@ class TankStats:
     bullet_damage: int
     image_type: int
     body_scale: float
-    turret_offset: list[int]
+    turret_offset: tuple[int, int]
     turret_scale: float
     drift: float
     reload_speed: int
     max_shells: int
     name: str
-    color: int = 1
 
 
 def _load_assets(path: str) -> dict[str, any]:
@@ -80,6 +79,44 @@ SMALL_FONT = pg.freetype.Font(f"{PATH}/assets/Roboto-Regular.ttf", 20)
 DEBUG = False
 BOUNCE = False
 MANUAL_TURRET = False
+MUTE = False
+DESTRUCTIBLE_WALLS = True
+WALL_HEALTH = 12
+ADAPTIVE_QUALITY = True
+# Collide the pixels of the rotated sprites instead of the square boxes of the entities
+PIXEL_COLLISION = False
+# Only show what the tanks of FOG_TEAM can see within FOG_RADIUS tiles
+FOG_OF_WAR = False
+FOG_TEAM = "red"
+FOG_RADIUS = 12
+FOG_DARKNESS = 200
+# Rotated collision masks are cached for angles in steps of this many degrees
+MASK_ANGLE_STEP = 3
+MASK_CACHE_SIZE = 512
+# Simulate in fixed point with lookup table trigonometry and record a checksum of every
+# tick, so the same seed and actions give the same match on every machine. Collides
+# boxes only, since rotated masks depend on how pygame rotates on the platform.
+DETERMINISTIC = False
+# Broadcast every match to read-only viewers, see `tanks.spectator`. Viewers that can't
+# keep up skip frames once SPECTATOR_BUFFER bytes are waiting for them.
+SPECTATE = False
+SPECTATOR_HOST = "127.0.0.1"
+SPECTATOR_PORT = 7878
+SPECTATOR_BUFFER = 16 * 1024
+# Internal resolution of the game relative to its logical size, the size of the map
+RENDER_SCALE = 1.0
+# Record matches, None or one of "raw", "png" and "ffmpeg"
+CAPTURE = None
+# Write match events to TELEMETRY_PATH, tank positions every TELEMETRY_SAMPLE_RATE ticks
+TELEMETRY = False
+TELEMETRY_PATH = "telemetry.jsonl"
+TELEMETRY_SAMPLE_RATE = 15
+# Warn when the accounted memory of assets, caches and maps is above this
+MEMORY_BUDGET_MB = 512
+# Print the full memory report of the running session, in any scene
+MEMORY_REPORT_KEY = pg.K_F9
+# Settings file with the control bindings of the local players, see controls.DEFAULT_BINDINGS
+CONTROLS_PATH = "controls.json"
 FPS = 60
 
 BLACK = (24, 24, 27)
@@ -97,18 +134,20 @@ def generate_text(
     text: str,
     *,
     font: pg.freetype.Font = NORMAL_FONT,
+    scale: float = 1,
 ) -> pg.Surface:
     """A function to generate a surface with the specified text with a drop shadow."""
 
-    offset = font.size // 10
-    text_size: pg.Rect = font.get_rect(text)
+    size = font.size * scale
+    offset = int(size // 10)
+    text_size: pg.Rect = font.get_rect(text, size=size)
     screen = pg.Surface([c + offset for c in text_size.size])
 
     # Transparent background
     screen = screen.convert_alpha()
     screen.fill((0, 0, 0, 0))
 
-    font.render_to(screen, (offset, offset), text, DARK_GRAY)
-    font.render_to(screen, (0, 0), text, WHITE)
+    font.render_to(screen, (offset, offset), text, DARK_GRAY, size=size)
+    font.render_to(screen, (0, 0), text, WHITE, size=size)
 
     return screen
@@ -0,0 +1,104 @@
+from dataclasses import dataclass, fields
+
+import pygame as pg
+
+import tanks.store as store
+from tanks.memory import tracked_cache
+
+TYPES_PREFIX = "/types/"
+
+
+class TankTypeError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class TankSprites:
+    body: pg.Surface
+    turret: pg.Surface
+    broken_body: pg.Surface
+    broken_turret: pg.Surface
+
+
+def _validate(path: str, data: dict[str, any]) -> store.TankStats:
+    """Check a raw tank type and convert it into a TankStats record."""
+
+    expected = {field.name: field.type for field in fields(store.TankStats)}
+    missing = expected.keys() - data.keys()
+    unknown = data.keys() - expected.keys()
+    if missing:
+        raise TankTypeError(f"{path}: missing {', '.join(sorted(missing))}")
+    if unknown:
+        raise TankTypeError(f"{path}: unknown {', '.join(sorted(unknown))}")
+
+    values = {}
+    for name, value in data.items():
+        field_type = expected[name]
+        if field_type is str:
+            valid = isinstance(value, str) and value
+        elif field_type is int:
+            valid = isinstance(value, int) and not isinstance(value, bool) and value > 0
+        elif field_type is float:
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+        else:
+            valid = (
+                isinstance(value, list)
+                and len(value) == 2
+                and all(isinstance(v, (int, float)) for v in value)
+            )
+            value = tuple(value)
+
+        if not valid:
+            raise TankTypeError(f"{path}: invalid value {value!r} for {name}")
+        values[name] = value
+
+    return store.TankStats(**values)
+
+
+@tracked_cache
+def get_tank_types() -> dict[str, store.TankStats]:
+    """Load and validate all tank types once. Keys are the asset paths, sorted."""
+    return {
+        path: _validate(path, store.ASSETS[path])
+        for path in sorted(store.ASSETS)
+        if path.startswith(TYPES_PREFIX) and path.endswith(".json")
+    }
+
+
+def get_tank_type(path: str) -> store.TankStats:
+    try:
+        return get_tank_types()[path]
+    except KeyError:
+        raise TankTypeError(f"Unknown tank type {path}") from None
+
+
+def load_tank_sprites(path: str, color: int) -> TankSprites:
+    """Scale new sprites of a tank type and color. Use `get_tank_sprites` to share them."""
+
+    stats = get_tank_type(path)
+    tank_path = "/images/proprietary/tank"
+
+    return TankSprites(
+        pg.transform.scale_by(
+            store.ASSETS[f"{tank_path}/Tanks_base/tank{stats.image_type}_color{color}.png"],
+            stats.body_scale,
+        ),
+        pg.transform.scale_by(
+            store.ASSETS[f"{tank_path}/Cannons_color{color}/cannon{stats.image_type}_1.png"],
+            stats.turret_scale,
+        ),
+        pg.transform.scale_by(
+            store.ASSETS[f"{tank_path}/Broken_assets/tank{stats.image_type}_color1_broken.png"],
+            stats.body_scale,
+        ),
+        pg.transform.scale_by(
+            store.ASSETS[f"{tank_path}/Broken_assets/cannon{stats.image_type}_1_broken.png"],
+            stats.turret_scale,
+        ),
+    )
+
+
+@tracked_cache
+def get_tank_sprites(path: str, color: int) -> TankSprites:
+    """Scale the sprites of a tank type and color once and share them everywhere."""
+    return load_tank_sprites(path, color)
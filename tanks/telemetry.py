@@ -0,0 +1,101 @@
+import atexit
+import json
+import threading
+import time
+from collections import deque
+from functools import cache
+
+import tanks.store as store
+
+# Names of the fields after (kind, match, frame) of each event
+EVENT_FIELDS = {
+    "match_start": ("map", "tank_types"),
+    "position": ("tank", "x", "y"),
+    "shot": ("tank",),
+    "hit": ("shooter", "target", "damage", "type"),
+    "starved": ("tank", "frames"),
+    "death": ("tank", "time_to_kill"),
+    "match_end": ("winner",),
+}
+
+
+class Telemetry:
+    """
+    Writes match events as JSON lines from a background thread.
+
+    The game only appends event tuples to a deque, which is thread safe without a lock.
+    The writer wakes up every `interval` seconds, drains the deque and writes the whole
+    batch at once. Damage per tank type is summed up and written at the end of a match.
+    """
+
+    def __init__(self, path: str, interval: float = 0.5):
+        self.path = path
+        self.interval = interval
+        self.events: deque[tuple] = deque()
+        self.matches = 0
+        self.running = True
+
+        self.damage_by_type: dict[int, dict[str, int]] = {}
+
+        self.thread = threading.Thread(target=self._write_events, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def start_match(self, map_path: str, tank_types: list[str]) -> int:
+        self.matches += 1
+        self.push(("match_start", self.matches, 0, map_path, tank_types))
+        return self.matches
+
+    def push(self, event: tuple):
+        self.events.append(event)
+
+    def close(self):
+        if self.running:
+            self.running = False
+            self.thread.join()
+
+    def _to_dict(self, event: tuple) -> dict[str, any]:
+        kind, match, frame, *values = event
+        data = {"event": kind, "match": match, "frame": frame}
+        data.update(zip(EVENT_FIELDS[kind], values))
+
+        if kind == "hit":
+            damage = self.damage_by_type.setdefault(match, {})
+            damage[data["type"]] = damage.get(data["type"], 0) + data["damage"]
+        elif kind == "match_end":
+            data["damage_by_type"] = self.damage_by_type.pop(match, {})
+
+        return data
+
+    def _write_events(self):
+        with open(self.path, "a") as f:
+            while True:
+                running = self.running
+                batch = []
+                while self.events:
+                    batch.append(json.dumps(self._to_dict(self.events.popleft())))
+                if batch:
+                    f.write("\n".join(batch) + "\n")
+                    f.flush()
+
+                if not running:
+                    return
+                time.sleep(self.interval)
+
+
+class NullTelemetry:
+    """Telemetry that records nothing, used when telemetry is turned off."""
+
+    def start_match(self, map_path: str, tank_types: list[str]) -> int:
+        return 0
+
+    def push(self, event: tuple):
+        pass
+
+
+@cache
+def get_telemetry() -> Telemetry | NullTelemetry:
+    if not store.TELEMETRY:
+        return NullTelemetry()
+
+    return Telemetry(store.TELEMETRY_PATH)
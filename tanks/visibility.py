@@ -0,0 +1,182 @@
+import pygame as pg
+
+from tanks.map_compiler import TILE_SIZE, WALL
+
+# Multipliers that transform the first octant into each of the eight octants
+_OCTANTS = (
+    (1, 0, 0, 1),
+    (0, 1, 1, 0),
+    (0, -1, 1, 0),
+    (-1, 0, 0, 1),
+    (-1, 0, 0, -1),
+    (0, -1, -1, 0),
+    (0, 1, -1, 0),
+    (1, 0, 0, -1),
+)
+
+Tile = tuple[int, int]
+
+
+def _cast_light(
+    tile_map: list[list[str]],
+    origin: Tile,
+    radius: int,
+    row: int,
+    start: float,
+    end: float,
+    octant: tuple[int, int, int, int],
+    visible: set[Tile],
+):
+    """Scan one octant row by row, recursing around walls with narrowed slopes."""
+
+    if start < end:
+        return
+
+    xx, xy, yx, yy = octant
+    height, width = len(tile_map), len(tile_map[0])
+    new_start = 0.0
+    for distance in range(row, radius + 1):
+        blocked = False
+        dy = -distance
+        for dx in range(-distance, 1):
+            left_slope = (dx - 0.5) / (dy + 0.5)
+            right_slope = (dx + 0.5) / (dy - 0.5)
+            if start < right_slope:
+                continue
+            if end > left_slope:
+                break
+
+            x = origin[0] + dx * xx + dy * xy
+            y = origin[1] + dx * yx + dy * yy
+            if not (0 <= x < width and 0 <= y < height):
+                continue
+
+            if dx * dx + dy * dy <= radius * radius:
+                visible.add((x, y))
+
+            wall = tile_map[y][x] == WALL
+            if blocked:
+                if wall:
+                    new_start = right_slope
+                else:
+                    blocked = False
+                    start = new_start
+            elif wall and distance < radius:
+                blocked = True
+                _cast_light(
+                    tile_map, origin, radius, distance + 1, start, left_slope, octant, visible
+                )
+                new_start = right_slope
+
+        if blocked:
+            break
+
+
+def compute_visibility(tile_map: list[list[str]], origin: Tile, radius: int) -> frozenset[Tile]:
+    """The tiles visible from the origin tile within the radius, walls included."""
+
+    visible = {origin}
+    for octant in _OCTANTS:
+        _cast_light(tile_map, origin, radius, 1, 1.0, 0.0, octant, visible)
+    return frozenset(visible)
+
+
+class FogOfWar:
+    """
+    Tracks the tiles every team can see and renders the fog for one of them.
+
+    Visibility is cached per tile and radius and only looked up again when a tank
+    crosses a tile boundary. The cache is dropped when a wall breaks. The fog is
+    baked into a darkened copy of the map image, which is drawn instead of the map,
+    so it costs nothing per frame. Only tiles whose visibility changed are updated.
+    """
+
+    def __init__(self, game, team: str, radius: int, darkness: int):
+        self.game = game
+        self.team = team
+        self.radius = radius
+        # Hidden tiles are multiplied with this color
+        self.dim = (255 - darkness,) * 3
+
+        self.cache: dict[tuple[Tile, int], frozenset[Tile]] = {}
+        self.map_version = game.map_handler.version
+        self.tank_tiles: dict[int, Tile | None] = {}
+        self.visible: dict[str, frozenset[Tile]] = {}
+
+        self.image: pg.Surface | None = None
+        self.shown: frozenset[Tile] = frozenset()
+        self.resize()
+
+    def get_visibility(self, tile: Tile) -> frozenset[Tile]:
+        key = (tile, self.radius)
+        if key not in self.cache:
+            self.cache[key] = compute_visibility(
+                self.game.map_handler.tile_map, tile, self.radius
+            )
+        return self.cache[key]
+
+    def update(self):
+        map_changed = self.game.map_handler.version != self.map_version
+        if map_changed:
+            self.map_version = self.game.map_handler.version
+            self.cache.clear()
+            self.tank_tiles.clear()
+
+        changed_teams = set()
+        for tank in self.game.tanks:
+            tile = None
+            if not tank.is_destroyed:
+                tile = (tank.box.centerx // TILE_SIZE, tank.box.centery // TILE_SIZE)
+            if self.tank_tiles.get(tank.id, ()) != tile:
+                self.tank_tiles[tank.id] = tile
+                changed_teams.add(tank.team)
+
+        for team in changed_teams:
+            self.visible[team] = frozenset().union(
+                *(
+                    self.get_visibility(self.tank_tiles[tank.id])
+                    for tank in self.game.tanks
+                    if tank.team == team and self.tank_tiles[tank.id] is not None
+                )
+            )
+
+        # A broken wall changed the map image, so start over from it
+        if map_changed:
+            self.resize()
+        elif self.team in changed_teams:
+            self.update_image(self.visible[self.team])
+
+    def is_visible(self, pos: tuple[float, float]) -> bool:
+        tile = (int(pos[0] // TILE_SIZE), int(pos[1] // TILE_SIZE))
+        return tile in self.visible.get(self.team, ())
+
+    def tile_rect(self, tile: Tile) -> pg.Rect:
+        # Rounded on the grid lines, so neighbouring tiles never overlap at any scale
+        scale = self.game.scale * TILE_SIZE
+        left, top = round(tile[0] * scale), round(tile[1] * scale)
+        right, bottom = round((tile[0] + 1) * scale), round((tile[1] + 1) * scale)
+        return pg.Rect(left, top, right - left, bottom - top)
+
+    def update_image(self, visible: frozenset[Tile]):
+        if self.image is None:
+            return
+
+        for tile in visible ^ self.shown:
+            rect = self.tile_rect(tile)
+            if tile in visible:
+                self.image.blit(self.game.map_img, rect, rect)
+            else:
+                self.image.fill(self.dim, rect, special_flags=pg.BLEND_MULT)
+        self.shown = visible
+
+    def resize(self):
+        """Recreate the fogged map image from the map image of the game."""
+        # Headless games have no map image, only the visibility is tracked
+        if self.game.map_img is None:
+            return
+
+        self.image = self.game.map_img.copy()
+        self.image.fill(self.dim, special_flags=pg.BLEND_MULT)
+        self.shown = frozenset()
+        if self.team in self.visible:
+            self.update_image(self.visible[self.team])